@@ -0,0 +1,154 @@
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+from typing import Callable
+
+from day09 import ExtentDrive, HardDrive
+
+# Each engine takes a disk map, runs to completion and returns the resulting checksum
+Engine = Callable[[str], int]
+
+
+def hard_drive_compact(disk_map: str) -> int:
+    drive = HardDrive(disk_map)
+    drive.compact_disk()
+    return drive.checksum
+
+
+def extent_drive_compact(disk_map: str) -> int:
+    drive = ExtentDrive(disk_map)
+    drive.compact_disk()
+    return drive.checksum
+
+
+def hard_drive_defrag(disk_map: str) -> int:
+    drive = HardDrive(disk_map)
+    # defrag_disk reports every file it moves, which would swamp the benchmark output
+    with contextlib.redirect_stdout(io.StringIO()):
+        drive.defrag_disk()
+    return drive.checksum
+
+
+def hard_drive_defrag_optimized(disk_map: str) -> int:
+    drive = HardDrive(disk_map)
+    drive.defrag_disk_optimized()
+    return drive.checksum
+
+
+def extent_drive_defrag(disk_map: str) -> int:
+    drive = ExtentDrive(disk_map)
+    drive.defrag_disk()
+    return drive.checksum
+
+
+# Engines are grouped by the operation they perform, every engine in a group must agree
+# The value is the largest disk map (in digits) each engine is run on, None for no limit
+ENGINES: dict[str, dict[str, tuple[Engine, int | None]]] = {
+    "compact": {
+        "HardDrive.compact_disk": (hard_drive_compact, None),
+        "ExtentDrive.compact_disk": (extent_drive_compact, None),
+    },
+    "defrag": {
+        "HardDrive.defrag_disk": (hard_drive_defrag, 2_000),
+        "HardDrive.defrag_disk_optimized": (hard_drive_defrag_optimized, None),
+        "ExtentDrive.defrag_disk": (extent_drive_defrag, None),
+    },
+}
+
+
+def generate_disk_map(digits: int, seed: int) -> str:
+    """
+    Generate a random disk map of the given number of digits
+    Always ends on a file, as puzzle inputs do
+    """
+    rng = random.Random(seed)
+    if digits % 2 == 0:
+        digits += 1
+    return "".join(str(rng.randint(1 if i % 2 == 0 else 0, 9)) for i in range(digits))
+
+
+def run_benchmarks(sizes: list[int], seed: int, repeat: int) -> list[dict]:
+    """
+    Run every engine on a generated disk map at each size
+    Raises an AssertionError if engines in the same group disagree on the checksum
+    Returns one result record per (size, engine)
+    """
+    results = []
+    for digits in sizes:
+        disk_map = generate_disk_map(digits, seed)
+        num_blocks = sum(int(digit) for digit in disk_map)
+        num_files = (len(disk_map) + 1) // 2
+
+        for group, engines in ENGINES.items():
+            checksums = {}
+            for name, (engine, limit) in engines.items():
+                if limit is not None and len(disk_map) > limit:
+                    continue
+
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    checksum = engine(disk_map)
+                    timings.append(time.perf_counter() - start)
+
+                checksums[name] = checksum
+                results.append(
+                    {
+                        "group": group,
+                        "engine": name,
+                        "digits": len(disk_map),
+                        "blocks": num_blocks,
+                        "files": num_files,
+                        "checksum": checksum,
+                        "seconds": min(timings),
+                    }
+                )
+                print(
+                    f"{group:8} {name:32} {len(disk_map):>9} digits {min(timings):10.4f}s"
+                )
+
+            assert (
+                len(set(checksums.values())) <= 1
+            ), f"Checksum mismatch for {group} on {len(disk_map)} digits: {checksums}"
+
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark and cross check the day09 compaction and defrag engines"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1_000, 4_000, 16_000, 64_000],
+        help="Disk map sizes to generate, in digits",
+    )
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Runs per engine, the best is kept"
+    )
+    parser.add_argument(
+        "--output", default="bench_day09.json", help="Path to write results to"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        results = run_benchmarks(args.sizes, args.seed, args.repeat)
+    except AssertionError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    with open(args.output, "w") as fp:
+        json.dump({"seed": args.seed, "results": results}, fp, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
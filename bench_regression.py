@@ -0,0 +1,368 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable
+
+import day01
+import day02
+import day03
+import day04
+import day05
+import day06
+import day07
+import day08
+import day09
+import day10
+import day11
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "bench_baselines.json"
+)
+SIZES = ["small", "medium", "large"]
+SEED = 2024
+
+# Each case generates a text input from a seeded rng and a size, then solves it
+InputGenerator = Callable[[random.Random, str], str]
+Solver = Callable[[str], int]
+
+
+def gen_lists(rng: random.Random, size: str) -> str:
+    count = {"small": 1_000, "medium": 10_000, "large": 100_000}[size]
+    return "".join(
+        f"{rng.randint(10_000, 99_999)}   {rng.randint(10_000, 99_999)}\n"
+        for _ in range(count)
+    )
+
+
+def solve_distance(path: str) -> int:
+    return day01.calculate_distance(*day01.load_lists(path))
+
+
+def gen_reports(rng: random.Random, size: str) -> str:
+    count = {"small": 1_000, "medium": 10_000, "large": 50_000}[size]
+    lines = []
+    for _ in range(count):
+        level = rng.randint(1, 50)
+        step = rng.choice([-1, 1])
+        report = []
+        for _ in range(rng.randint(5, 8)):
+            report.append(level)
+            level += step * rng.randint(0, 4)
+        lines.append(" ".join(map(str, report)))
+    return "\n".join(lines) + "\n"
+
+
+def solve_is_safe(path: str) -> int:
+    return sum(day02.is_safe(report) for report in day02.read_data(path))
+
+
+def gen_program(rng: random.Random, size: str) -> str:
+    length = {"small": 10_000, "medium": 100_000, "large": 500_000}[size]
+    tokens = ["mul(", ")", ",", "do()", "don't()", "x", "]", "%", "mul", "(", " "]
+    chunks = []
+    total = 0
+    while total < length:
+        if rng.random() < 0.3:
+            chunk = f"mul({rng.randint(1, 999)},{rng.randint(1, 999)})"
+        else:
+            chunk = rng.choice(tokens)
+        chunks.append(chunk)
+        total += len(chunk)
+    return "".join(chunks) + "\n"
+
+
+def solve_parse_line(path: str) -> int:
+    with open(path, "r") as fp:
+        muls, _ = day03.parse_line(fp.read(), True)
+    return day03.compute_muls(muls)
+
+
+def gen_letters(rng: random.Random, size: str) -> str:
+    width = {"small": 50, "medium": 140, "large": 300}[size]
+    return "".join(
+        "".join(rng.choice("XMAS") for _ in range(width)) + "\n" for _ in range(width)
+    )
+
+
+def solve_find_xmas(path: str) -> int:
+    return day04.WordSearch(path).find_xmas()
+
+
+def gen_rules(rng: random.Random, size: str) -> str:
+    pages = {"small": 25, "medium": 49, "large": 89}[size]
+    num_updates = {"small": 200, "medium": 1_000, "large": 2_000}[size]
+    order = rng.sample(range(10, 100), pages)
+    rules = [f"{a}|{b}" for i, a in enumerate(order) for b in order[i + 1 :]]
+    updates = []
+    for _ in range(num_updates):
+        length = rng.randrange(5, min(pages, 23), 2)
+        updates.append(",".join(map(str, rng.sample(order, length))))
+    return "\n".join(rules) + "\n\n" + "\n".join(updates) + "\n"
+
+
+def solve_fix_update(path: str) -> int:
+    updates, rules = day05.parse_input(path)
+    fixed = (rules.fix_update(update) for update in updates)
+    return sum(update[len(update) // 2] for update in fixed)
+
+
+def gen_lab(rng: random.Random, size: str) -> str:
+    """
+    Obstacles turning the guard in an outward square spiral, two cells between its turns, so
+    they patrol about half the map before walking off it, with random obstacles scattered
+    where the guard never walks
+    """
+    width = {"small": 30, "medium": 80, "large": 130}[size]
+    rows = [["."] * width for _ in range(width)]
+    x = y = width // 2
+    rows[y][x] = "^"
+    path = {(x, y)}
+
+    # Up, right, down then left, the order the guard turns in
+    headings = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+    leg = 2
+    for turn in itertools.count():
+        dx, dy = headings[turn % 4]
+        for _ in range(leg):
+            x, y = x + dx, y + dy
+            if not (0 <= x < width and 0 <= y < width):
+                break
+            path.add((x, y))
+        else:
+            if 0 <= x + dx < width and 0 <= y + dy < width:
+                rows[y + dy][x + dx] = "#"
+            if turn % 2:
+                leg += 2
+            continue
+        break
+
+    for y, row in enumerate(rows):
+        for x, cell in enumerate(row):
+            if cell == "." and (x, y) not in path and rng.random() < 0.05:
+                row[x] = "#"
+    return "".join("".join(row) + "\n" for row in rows)
+
+
+def solve_walk_guard(path: str) -> int:
+    visited = day06.LabMap(path).walk_guard()
+    return len(visited) if isinstance(visited, set) else -1
+
+
+def gen_equations(rng: random.Random, size: str) -> str:
+    count = {"small": 50, "medium": 200, "large": 500}[size]
+    lines = []
+    for _ in range(count):
+        values = [rng.randint(1, 99) for _ in range(rng.randint(3, 8))]
+        result = values[0]
+        for value in values[1:]:
+            result = rng.choice(
+                [result + value, result * value, int(f"{result}{value}")]
+            )
+        if rng.random() < 0.5:
+            result += 1
+        lines.append(f"{result}: {' '.join(map(str, values))}")
+    return "\n".join(lines) + "\n"
+
+
+def solve_is_valid_equation(path: str) -> int:
+    equations = day07.load_data(path)
+    return sum(
+        eq.result for eq in equations if day07.is_valid_equation(eq, with_concat=True)
+    )
+
+
+def gen_antennae(rng: random.Random, size: str) -> str:
+    width = {"small": 50, "medium": 100, "large": 200}[size]
+    freqs = "aAbB0123"
+    rows = [
+        [(rng.choice(freqs) if rng.random() < 0.01 else ".") for _ in range(width)]
+        for _ in range(width)
+    ]
+    return "".join("".join(row) + "\n" for row in rows)
+
+
+def solve_find_resonant_antinodes(path: str) -> int:
+    return day08.AntennaMap(path).find_resonant_antinodes()
+
+
+def gen_disk_map(rng: random.Random, size: str) -> str:
+    digits = {"small": 2_001, "medium": 20_001, "large": 100_001}[size]
+    return (
+        "".join(str(rng.randint(1 if i % 2 == 0 else 0, 9)) for i in range(digits))
+        + "\n"
+    )
+
+
+def solve_defrag_disk_optimized(path: str) -> int:
+    drive = day09.HardDrive(day09.load_disk_map(path))
+    drive.defrag_disk_optimized()
+    return drive.checksum
+
+
+def gen_topo(rng: random.Random, size: str) -> str:
+    width = {"small": 50, "medium": 150, "large": 400}[size]
+    return "".join(
+        "".join(str((x + y + rng.choice([0, 0, 1])) % 10) for x in range(width)) + "\n"
+        for y in range(width)
+    )
+
+
+def solve_topo_map(path: str) -> int:
+    topo = day10.TopoMap(path)
+    # Combine both parts into one answer, so a change in either is caught
+    return sum(topo.trailhead_scores().values()) * 1_000_000 + sum(
+        topo.trailhead_ratings().values()
+    )
+
+
+def gen_stones(rng: random.Random, size: str) -> str:
+    count = {"small": 10, "medium": 100, "large": 1_000}[size]
+    return " ".join(str(rng.randint(0, 10_000_000)) for _ in range(count)) + "\n"
+
+
+def solve_blink_stone(path: str) -> int:
+    # Clear the cache so every run does the same amount of work
+    day11.blink_stone.cache_clear()
+    return sum(day11.blink_stone(stone, 0) for stone in day11.load_stones(path))
+
+
+CASES: dict[str, tuple[InputGenerator, Solver]] = {
+    "calculate_distance": (gen_lists, solve_distance),
+    "is_safe": (gen_reports, solve_is_safe),
+    "parse_line": (gen_program, solve_parse_line),
+    "find_xmas": (gen_letters, solve_find_xmas),
+    "fix_update": (gen_rules, solve_fix_update),
+    "walk_guard": (gen_lab, solve_walk_guard),
+    "is_valid_equation": (gen_equations, solve_is_valid_equation),
+    "find_resonant_antinodes": (gen_antennae, solve_find_resonant_antinodes),
+    "defrag_disk_optimized": (gen_disk_map, solve_defrag_disk_optimized),
+    "topo_map": (gen_topo, solve_topo_map),
+    "blink_stone": (gen_stones, solve_blink_stone),
+}
+
+
+def run_case(name: str, size: str, repeat: int, workdir: str) -> dict:
+    """
+    Generate the input for a case, then solve it repeat times keeping the best time
+    """
+    generate, solve = CASES[name]
+    # Seed per case and size, so adding a case doesn't change the inputs of the others
+    rng = random.Random(f"{SEED}:{name}:{size}")
+    path = os.path.join(workdir, f"{name}-{size}")
+    with open(path, "w") as fp:
+        fp.write(generate(rng, size))
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        answer = solve(path)
+        timings.append(time.perf_counter() - start)
+
+    return {"answer": answer, "seconds": min(timings)}
+
+
+def compare(
+    name: str,
+    size: str,
+    result: dict,
+    baseline: dict | None,
+    tolerance: float,
+    min_seconds: float,
+) -> list[str]:
+    """
+    Check a result against its baseline, returning a description of each problem found
+    Timings within min_seconds of the baseline are never counted as regressions
+    """
+    if baseline is None:
+        return [f"{name}/{size}: no baseline"]
+
+    problems = []
+    if result["answer"] != baseline["answer"]:
+        problems.append(
+            f"{name}/{size}: answer changed from {baseline['answer']} to {result['answer']}"
+        )
+
+    limit = max(
+        baseline["seconds"] * (1 + tolerance), baseline["seconds"] + min_seconds
+    )
+    if result["seconds"] > limit:
+        problems.append(
+            f"{name}/{size}: took {result['seconds']:.4f}s, baseline {baseline['seconds']:.4f}s"
+        )
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Time each solver on seeded inputs and compare against stored baselines"
+    )
+    parser.add_argument("cases", nargs="*", default=list(CASES), help="Cases to run")
+    parser.add_argument("--sizes", nargs="+", default=SIZES, choices=SIZES)
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per case, the best is kept"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.5, help="Allowed slowdown as a fraction"
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.005,
+        help="Slowdowns smaller than this are noise",
+    )
+    parser.add_argument("--baselines", default=BASELINE_PATH)
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Record these results as the new baselines",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.baselines, "r") as fp:
+            baselines = json.load(fp)
+    except FileNotFoundError:
+        baselines = {}
+
+    problems = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in args.cases:
+            for size in args.sizes:
+                result = run_case(name, size, args.repeat, workdir)
+                print(
+                    f"{name:24} {size:7} {result['seconds']:10.4f}s  {result['answer']}"
+                )
+
+                if args.update:
+                    baselines.setdefault(name, {})[size] = result
+                else:
+                    baseline = baselines.get(name, {}).get(size)
+                    problems.extend(
+                        compare(
+                            name,
+                            size,
+                            result,
+                            baseline,
+                            args.tolerance,
+                            args.min_seconds,
+                        )
+                    )
+
+    if args.update:
+        with open(args.baselines, "w") as fp:
+            json.dump(baselines, fp, indent=2)
+            fp.write("\n")
+        return 0
+
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
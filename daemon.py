@@ -0,0 +1,414 @@
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from runner import DAYS
+
+# Path of the Unix socket the daemon listens on, defaults to one in the temp directory
+SOCKET_ENV = "AOC_SOCKET"
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), f"aoc-solver-{os.getuid()}.sock")
+
+# The most answers kept per input, beyond which the least recently asked for is dropped
+MAX_ANSWERS = 256
+
+Params = dict[str, Any]
+# Parses an input file into the structure a day's queries run against
+Loader = Callable[[str], Any]
+# Answers one query from the parsed input and any parameters given with the request
+Query = Callable[[Any, Params], int]
+
+
+def _load_day05(path: str) -> tuple[list[list[int]], Any]:
+    import day05
+
+    updates, rules = day05.parse_input(path)
+    # parse_input streams the updates, keep them so they can be queried more than once
+    return list(updates), rules
+
+
+def _day05_part1(parsed: tuple, params: Params) -> int:
+    updates, rules = parsed
+    return sum(
+        update[len(update) // 2] for update in updates if rules.check_update(update)
+    )
+
+
+def _day05_part2(parsed: tuple, params: Params) -> int:
+    updates, rules = parsed
+    return sum(rules.middles_of_fixed(u for u in updates if not rules.check_update(u)))
+
+
+def _load_day06(path: str) -> tuple[Any, Any]:
+    import day06
+
+    # The map with its GuardBatch jump table, which is the costliest part of setting up part 2
+    lab_map = day06.LabMap(path)
+    return lab_map, day06.GuardBatch(lab_map).jumps
+
+
+def _day06_part1(parsed: tuple, params: Params) -> int:
+    # Walking moves the guard, so walk a copy
+    lab_map = copy(parsed[0])
+    visited = lab_map.walk_guard()
+    assert isinstance(visited, set)
+    return len(visited)
+
+
+def _day06_part2(parsed: tuple, params: Params) -> int:
+    import day06
+
+    lab_map, jumps = parsed
+    return day06.count_loop_obstacles(lab_map, jumps=jumps)
+
+
+def _load_day09(path: str) -> str:
+    import day09
+
+    return day09.load_disk_map(path)
+
+
+def _drive(disk_map: str, params: Params) -> Any:
+    """
+    A fresh drive for the disk map, params["engine"] picks "blocks" (the default) or "extents"
+    """
+    import day09
+
+    engine = params.get("engine", "blocks")
+    if engine == "blocks":
+        return day09.HardDrive(disk_map)
+    if engine == "extents":
+        return day09.ExtentDrive(disk_map)
+    raise ValueError(f"Unknown engine {engine!r}")
+
+
+def _day09_part1(disk_map: str, params: Params) -> int:
+    drive = _drive(disk_map, params)
+    drive.compact_disk()
+    return drive.checksum
+
+
+def _day09_part2(disk_map: str, params: Params) -> int:
+    drive = _drive(disk_map, params)
+    if params.get("engine", "blocks") == "blocks":
+        drive.defrag_disk_optimized()
+    else:
+        drive.defrag_disk()
+    return drive.checksum
+
+
+def _load_day10(path: str) -> Any:
+    import day10
+
+    return day10.TopoMap(path)
+
+
+def _day10_part1(topo: Any, params: Params) -> int:
+    # The sweep for each target is cached on the map, so repeat queries only visit trailheads
+    target = params.get("target", 9)
+    return sum(topo.reachable_count([th], target) for th in topo.find_trailheads())
+
+
+def _day10_part2(topo: Any, params: Params) -> int:
+    return topo.path_count(topo.find_trailheads(), params.get("target", 9))
+
+
+def _load_day11(path: str) -> list[int]:
+    import day11
+
+    return day11.load_stones(path)
+
+
+def _day11_part1(stones: list[int], params: Params) -> int:
+    import day11
+
+    return day11.count_stones(stones, params.get("blinks", 25))
+
+
+def _day11_part2(stones: list[int], params: Params) -> int:
+    import day11
+
+    return day11.count_stones(stones, params.get("blinks", day11.BLINKS))
+
+
+def _load_path(path: str) -> str:
+    return path
+
+
+def _module_part(day: str, part: str) -> Query:
+    """
+    A query calling a day module's part function on the input path, for days without a loader
+    """
+
+    def query(path: str, params: Params) -> int:
+        return getattr(importlib.import_module(day), part)(path)
+
+    return query
+
+
+# Days whose parsed inputs are kept in memory, with the queries that can be run against them
+# and the names of the params those queries take
+# Any other day is answered by calling its module's part function on the input path
+LOADED_DAYS: dict[str, tuple[Loader, dict[str, Query], frozenset[str]]] = {
+    "day05": (
+        _load_day05,
+        {"part1": _day05_part1, "part2": _day05_part2},
+        frozenset(),
+    ),
+    "day06": (
+        _load_day06,
+        {"part1": _day06_part1, "part2": _day06_part2},
+        frozenset(),
+    ),
+    "day09": (
+        _load_day09,
+        {"part1": _day09_part1, "part2": _day09_part2},
+        frozenset({"engine"}),
+    ),
+    "day10": (
+        _load_day10,
+        {"part1": _day10_part1, "part2": _day10_part2},
+        frozenset({"target"}),
+    ),
+    "day11": (
+        _load_day11,
+        {"part1": _day11_part1, "part2": _day11_part2},
+        frozenset({"blinks"}),
+    ),
+}
+
+
+@dataclass
+class InputEntry:
+    # Size and modification time of the input file when it was parsed
+    stamp: tuple[int, int]
+    parsed: Any
+    # Answers already given for this input, keyed on part and params, least recently asked first
+    answers: dict[tuple[str, str], int] = field(default_factory=dict)
+
+    def recall(self, key: tuple[str, str]) -> int | None:
+        """
+        The answer given before for the key, if it's still kept
+        """
+        answer = self.answers.pop(key, None)
+        if answer is not None:
+            self.answers[key] = answer
+        return answer
+
+    def remember(self, key: tuple[str, str], answer: int) -> None:
+        """
+        Keep an answer, dropping the least recently asked for once there are MAX_ANSWERS
+        """
+        if len(self.answers) >= MAX_ANSWERS:
+            del self.answers[next(iter(self.answers))]
+        self.answers[key] = answer
+
+
+class InputStore:
+    """
+    Parsed inputs, and the answers found from them, kept in memory keyed on day and input path
+    An input is parsed again, and its answers discarded, only when its file's size or
+    modification time changes
+    """
+
+    def __init__(self):
+        self._entries: dict[tuple[str, str], InputEntry] = {}
+
+    def get(self, day: str, path: str, loader: Loader) -> tuple[InputEntry, bool]:
+        """
+        The entry for the input, and whether it had to be (re)loaded
+        """
+        key = (day, os.path.abspath(path))
+        stat = os.stat(path)
+        stamp = (stat.st_size, stat.st_mtime_ns)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.stamp == stamp:
+            return entry, False
+
+        entry = self._entries[key] = InputEntry(stamp, loader(path))
+        return entry, True
+
+
+class SolverDaemon:
+    """
+    Answers solve requests from the inputs and day modules it keeps loaded
+
+    Requests and responses are JSON objects, one per line, any number per connection
+    A request is {"day": "day11", "part": "part2", "input": "inputs/day11", "params": {...}}
+    with params optional, e.g. {"blinks": 40} for day11 or {"engine": "extents"} for day09
+    Params a day doesn't take are rejected rather than ignored
+    A response is {"ok": true, "answer": ..., "seconds": ..., "reloaded": ..., "cached": ...}
+    or {"ok": false, "error": ...}, cached when the same query was already answered for the
+    input as it is now
+
+    Queries run one at a time on a single worker thread, as the parsed inputs are shared and
+    not safe to query concurrently, leaving the event loop free to accept connections
+    """
+
+    def __init__(self):
+        self.inputs = InputStore()
+        self.worker = ThreadPoolExecutor(max_workers=1)
+
+    def solve(self, request: dict) -> dict:
+        day, part, path = request["day"], request["part"], request["input"]
+        params = request.get("params", {})
+
+        start = time.perf_counter()
+        if day in LOADED_DAYS:
+            loader, queries, param_names = LOADED_DAYS[day]
+        elif day in DAYS:
+            loader = _load_path
+            queries = {part: _module_part(day, part) for part in ("part1", "part2")}
+            param_names = frozenset()
+        else:
+            raise ValueError(f"Unknown day {day!r}")
+        if part not in queries:
+            raise ValueError(f"Unknown part {part!r} for {day}")
+        # A mistyped param would otherwise be ignored, and its answer cached under it
+        unknown = set(params) - param_names
+        if unknown:
+            raise ValueError(
+                f"Unknown params {sorted(unknown)} for {day}, "
+                f"expected {sorted(param_names) or 'none'}"
+            )
+
+        entry, reloaded = self.inputs.get(day, path, loader)
+        key = (part, json.dumps(params, sort_keys=True))
+        answer = entry.recall(key)
+        cached = answer is not None
+        if not cached:
+            answer = queries[part](entry.parsed, params)
+            entry.remember(key, answer)
+
+        return {
+            "ok": True,
+            "answer": answer,
+            "seconds": time.perf_counter() - start,
+            "reloaded": reloaded,
+            "cached": cached,
+        }
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    response = await loop.run_in_executor(
+                        self.worker, self.solve, request
+                    )
+                except Exception as exc:
+                    response = {"ok": False, "error": repr(exc)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: str) -> None:
+        # A socket left behind by a daemon that didn't exit cleanly would stop us binding
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        server = await asyncio.start_unix_server(self.handle, path=socket_path)
+        print("Listening on", socket_path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            # Newer Pythons remove the socket when the server closes
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            self.worker.shutdown()
+
+
+async def request(socket_path: str, requests: list[dict]) -> list[dict]:
+    """
+    Send requests to a running daemon over one connection, returning each response
+    """
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    responses = []
+    try:
+        for req in requests:
+            writer.write(json.dumps(req).encode() + b"\n")
+            await writer.drain()
+            responses.append(json.loads(await reader.readline()))
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return responses
+
+
+def parse_param(param: str) -> tuple[str, Any]:
+    """
+    Parse a name=value parameter, the value as JSON if it's valid JSON, otherwise as a string
+    """
+    name, _, value = param.partition("=")
+    try:
+        return name, json.loads(value)
+    except json.JSONDecodeError:
+        return name, value
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Keep inputs and solvers loaded between runs"
+    )
+    parser.add_argument(
+        "--socket",
+        default=os.environ.get(SOCKET_ENV, DEFAULT_SOCKET),
+        help="Unix socket path",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="Run the daemon")
+    solve = commands.add_parser("solve", help="Ask a running daemon for an answer")
+    solve.add_argument("day", help="e.g. day11")
+    solve.add_argument("part", help="e.g. part2")
+    solve.add_argument("input", nargs="?", help="Input path, defaults to inputs/<day>")
+    solve.add_argument(
+        "--param", action="append", default=[], help="name=value, e.g. blinks=40"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            asyncio.run(SolverDaemon().serve(args.socket))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    req = {
+        "day": args.day,
+        "part": args.part,
+        "input": os.path.abspath(args.input or f"inputs/{args.day}"),
+        "params": dict(parse_param(param) for param in args.param),
+    }
+    start = time.perf_counter()
+    (response,) = asyncio.run(request(args.socket, [req]))
+    latency = time.perf_counter() - start
+
+    if not response["ok"]:
+        print("Error:", response["error"], file=sys.stderr)
+        return 1
+    print(response["answer"])
+    print(
+        f"Solved in {response['seconds'] * 1000:.2f}ms, round trip {latency * 1000:.2f}ms"
+        + (", input reloaded" if response["reloaded"] else "")
+        + (", answer cached" if response["cached"] else ""),
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,23 @@
+from array import array
 from collections import Counter
+from typing import Generator, Sequence
 
+from instrument import hot_path
+from result_cache import cached_result
+from utils import OpStats
 
-def calculate_distance(list1: list[int], list2: list[int]) -> None:
+
+@hot_path
+def calculate_distance(list1: Sequence[int], list2: Sequence[int]) -> int:
     """
     Takes two lists and calculates the pairwise distance between them
     after sorting
     """
-    total_dist = sum(abs(v1 - v2) for v1, v2 in zip(sorted(list1), sorted(list2)))
-    print("Total distance between lists:", total_dist)
+    return sum(abs(v1 - v2) for v1, v2 in zip(sorted(list1), sorted(list2)))
 
 
-def calculate_similarity(list1: list[int], list2: list[int]) -> None:
+@hot_path
+def calculate_similarity(list1: Sequence[int], list2: Sequence[int]) -> int:
     """
     Takes two lists and calculates the similarity between them
     Similarity is defined as:
@@ -21,21 +28,55 @@ def calculate_similarity(list1: list[int], list2: list[int]) -> None:
     """
     list2_count = Counter(list2)
 
-    total_similarity = sum(v * list2_count[v] for v in list1)
-    print("Total similarity between lists:", total_similarity)
+    return sum(v * list2_count[v] for v in list1)
 
 
-def main(input_data: str):
-    list1 = []
-    list2 = []
+def read_pairs(input_data: str) -> Generator[tuple[int, int]]:
+    """
+    Lazily read the pair of values on each line of the input
+    """
     with open(input_data, "r") as fp:
-        for line in fp.readlines():
+        for line in fp:
             val1, val2 = line.split()
-            list1.append(int(val1))
-            list2.append(int(val2))
+            yield int(val1), int(val2)
+
+
+def load_lists(input_data: str) -> tuple[array, array]:
+    """
+    Load both columns of the input, stored as typed arrays rather than lists of int objects
+    """
+    list1 = array("q")
+    list2 = array("q")
+    for val1, val2 in read_pairs(input_data):
+        list1.append(val1)
+        list2.append(val2)
+
+    return list1, list2
+
 
-    calculate_distance(list1, list2)
-    calculate_similarity(list1, list2)
+def part1_stats(input_data: str) -> tuple[int, OpStats]:
+    list1, list2 = load_lists(input_data)
+    return calculate_distance(list1, list2), OpStats(pairs=len(list1))
+
+
+def part2_stats(input_data: str) -> tuple[int, OpStats]:
+    list1, list2 = load_lists(input_data)
+    return calculate_similarity(list1, list2), OpStats(pairs=len(list1))
+
+
+@cached_result
+def part1(input_data: str) -> int:
+    return part1_stats(input_data)[0]
+
+
+@cached_result
+def part2(input_data: str) -> int:
+    return part2_stats(input_data)[0]
+
+
+def main(input_data: str):
+    print("Total distance between lists:", part1(input_data))
+    print("Total similarity between lists:", part2(input_data))
 
 
 if __name__ == "__main__":
@@ -1,5 +1,9 @@
 from typing import Generator, Sequence
 
+from instrument import hot_path
+from result_cache import cached_result
+from utils import OpStats
+
 
 def read_data(input_path: str) -> Generator[tuple[int, ...]]:
     """
@@ -23,6 +27,7 @@ def in_range(val: int) -> bool:
     return abs(val) in (1, 2, 3)
 
 
+@hot_path
 def is_safe(report: Sequence[int]) -> bool:
     """
     Takes an iterable of integers representing a generator report and determine if it's safe
@@ -41,18 +46,22 @@ def is_safe(report: Sequence[int]) -> bool:
     return False
 
 
-def run_part1(input_path: str):
+def part1_stats(input_path: str) -> tuple[int, OpStats]:
+    stats = OpStats()
     num_safe = 0
     for report in read_data(input_path):
+        stats["safety_checks"] += 1
         if is_safe(report):
             num_safe += 1
 
-    print("Number of safe reports:", num_safe)
+    return num_safe, stats
 
 
-def run_part2(input_path: str):
+def part2_stats(input_path: str) -> tuple[int, OpStats]:
+    stats = OpStats()
     num_safe = 0
     for report in read_data(input_path):
+        stats["safety_checks"] += 1
         if is_safe(report):
             num_safe += 1
             continue
@@ -62,16 +71,27 @@ def run_part2(input_path: str):
         for i in range(len(report)):
             tmp_report = list(report)
             tmp_report.pop(i)
+            stats["safety_checks"] += 1
             if is_safe(tmp_report):
                 num_safe += 1
                 break
 
-    print("Number of safe reports with Problem Dampener:", num_safe)
+    return num_safe, stats
+
+
+@cached_result
+def part1(input_path: str) -> int:
+    return part1_stats(input_path)[0]
+
+
+@cached_result
+def part2(input_path: str) -> int:
+    return part2_stats(input_path)[0]
 
 
 def main(input_path: str):
-    run_part1(input_path)
-    run_part2(input_path)
+    print("Number of safe reports:", part1(input_path))
+    print("Number of safe reports with Problem Dampener:", part2(input_path))
 
 
 if __name__ == "__main__":
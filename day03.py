@@ -1,12 +1,17 @@
 import re
 import sys
 
+from instrument import hot_path
+from result_cache import cached_result
+from utils import OpStats
+
 
 MUL_PATTERN = re.compile(r"mul\(\d+,\d+\)")
 DO_PATTERN = re.compile(r"do\(\)")
 DONT_PATTERN = re.compile(r"don't\(\)")
 
 
+@hot_path
 def compute_muls(muls: list[str]) -> int:
     """
     Parse each "mul(x,y)" command into integers and perform the multiplication
@@ -20,15 +25,21 @@ def compute_muls(muls: list[str]) -> int:
     return sum(executed)
 
 
-def part1(path: str):
+def part1_stats(path: str) -> tuple[int, OpStats]:
     muls = []
     with open(path, "r") as fp:
         for line in fp.readlines():
             muls.extend(re.findall(MUL_PATTERN, line))
 
-    print("Total added results:", compute_muls(muls))
+    return compute_muls(muls), OpStats(muls=len(muls))
+
+
+@cached_result
+def part1(path: str) -> int:
+    return part1_stats(path)[0]
 
 
+@hot_path
 def parse_line(line: str, enabled: bool) -> tuple[list[str], bool]:
     """
     Parse a line of the program, returning all enabled mul(x,y) strings and the current enabled state
@@ -71,7 +82,7 @@ def parse_line(line: str, enabled: bool) -> tuple[list[str], bool]:
     return muls, enabled
 
 
-def part2(path: str):
+def part2_stats(path: str) -> tuple[int, OpStats]:
     muls = []
 
     enabled = True
@@ -80,12 +91,17 @@ def part2(path: str):
             found_muls, enabled = parse_line(line, enabled)
             muls.extend(found_muls)
 
-    print("Sum of all enabled muls:", compute_muls(muls))
+    return compute_muls(muls), OpStats(muls=len(muls))
+
+
+@cached_result
+def part2(path: str) -> int:
+    return part2_stats(path)[0]
 
 
 def main(path: str):
-    part1(path)
-    part2(path)
+    print("Total added results:", part1(path))
+    print("Sum of all enabled muls:", part2(path))
 
 
 if __name__ == "__main__":
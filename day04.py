@@ -1,3 +1,53 @@
+from instrument import hot_path
+from result_cache import cached_result
+from utils import OpStats
+
+
+# Matches any letter in a template
+WILDCARD = "."
+
+XMAS = ["XMAS"]
+XMAS_DIAGONAL = ["X...", ".M..", "..A.", "...S"]
+X_MAS = ["M.S", ".A.", "M.S"]
+
+
+def rotate(template: tuple[str, ...]) -> tuple[str, ...]:
+    """
+    The template rotated 90 degrees clockwise
+    """
+    return tuple(
+        "".join(row[col] for row in reversed(template))
+        for col in range(len(template[0]))
+    )
+
+
+def reflect(template: tuple[str, ...]) -> tuple[str, ...]:
+    """
+    The template mirrored left to right
+    """
+    return tuple(row[::-1] for row in template)
+
+
+def template_variants(
+    template: list[str], rotations: bool = False, reflections: bool = False
+) -> set[tuple[str, ...]]:
+    """
+    The distinct forms of a template, optionally in all four rotations and their mirror images
+    Rows are padded with wildcards to the width of the widest
+    Symmetric templates have fewer distinct variants, so each match is only counted once
+    """
+    width = max(len(row) for row in template)
+    variants = {tuple(row.ljust(width, WILDCARD) for row in template)}
+    if reflections:
+        variants |= {reflect(variant) for variant in variants}
+    if rotations:
+        for variant in list(variants):
+            for _ in range(3):
+                variant = rotate(variant)
+                variants.add(variant)
+    return variants
+
+
 class WordSearch:
     def __init__(self, path: str):
         grid = []
@@ -6,119 +56,103 @@ class WordSearch:
                 grid.append([char for char in line.strip()])
 
         self.grid = grid
-
+        self.height = len(grid)
+        self.width = max((len(row) for row in grid), default=0)
+
+        # One bitplane per letter over the grid in row major order, bit row * width + col
+        # is set where that letter is
+        planes: dict[str, int] = {}
+        for row_num, row in enumerate(grid):
+            row_bits: dict[str, int] = {}
+            for col, char in enumerate(row):
+                row_bits[char] = row_bits.get(char, 0) | 1 << col
+            for char, bits in row_bits.items():
+                planes[char] = planes.get(char, 0) | bits << (row_num * self.width)
+        self.planes = planes
+        self.stats = OpStats()
+
+    @hot_path
     def find_xmas(self) -> int:
         """
-        Find all occurances of XMAS in the grid
+        Find all occurances of XMAS in the grid, in any of the 8 directions
         """
-        xmas = 0
-
-        # Start from each position in the grid and search
-        for i in range(len(self.grid)):
-            for j in range(len(self.grid[0])):
-                xmas += self._match_xmas(i, j)
-
-        return xmas
+        return self.count_template(XMAS, rotations=True) + self.count_template(
+            XMAS_DIAGONAL, rotations=True
+        )
 
+    @hot_path
     def find_x_mas(self) -> int:
         """
         Find all occurances of X-MAS in the grid
         That is, two MAS in the shape of an X
         """
-        xmas = 0
-
-        # Start from each position in the grid and search
-        for i in range(len(self.grid)):
-            for j in range(len(self.grid[0])):
-                xmas += self._match_x_mas(i, j)
+        return self.count_template(X_MAS, rotations=True)
 
-        return xmas
-
-    def _match_xmas(self, xpos: int, ypos: int) -> int:
+    @hot_path
+    def count_template(
+        self, template: list[str], rotations: bool = False, reflections: bool = False
+    ) -> int:
         """
-        From the given starting point, extract itself and the next three letters
-        in all 8 possible directions and check if it matches XMAS
-        Returns the number of matches starting from this position
+        Count the places a 2D template of letters and wildcards matches the grid
+        Optionally also counting its rotations and mirror images
         """
-        # Fail early if this position isn't an X
-        if self.grid[xpos][ypos] != "X":
-            return 0
+        return sum(
+            self._count_variant(variant)
+            for variant in template_variants(template, rotations, reflections)
+        )
 
-        directions = [
-            (0, 1),  # down
-            (0, -1),  # up
-            (1, 0),  # right
-            (-1, 0),  # left
-            (1, 1),  # down right
-            (1, -1),  # up right
-            (-1, 1),  # down left
-            (-1, -1),  # up left
-        ]
-
-        candidates = [self._extract_4(xpos, ypos, *direc) for direc in directions]
-        return candidates.count("XMAS")
-
-    def _match_x_mas(self, xpos: int, ypos: int) -> int:
+    def _count_variant(self, template: tuple[str, ...]) -> int:
         """
-        From the given starting point, extract the x-shapes and check
-        if they're an X-MAS
+        Count matches of a single template, all of its rows the same width
+        Each letter of the template shifts that letter's plane back onto the template's top left
+        corner, so ANDing them leaves a bit set at every top left corner where all letters match
         """
-        # Sort the letters in MAS, makes it easier to check forward and reverse of each arm
-        match_string = sorted("MAS")
-        # Fail early if this position isn't an A
-        if self.grid[xpos][ypos] != "A":
+        self.stats["variants"] += 1
+        height, width = len(template), len(template[0])
+        if height > self.height or width > self.width:
             return 0
 
-        arm1, arm2 = self._extract_x(xpos, ypos)
-        if sorted(arm1) == match_string and sorted(arm2) == match_string:
-            return 1
-        else:
-            return 0
+        # Only corners where the whole template fits on the grid, so no shift wraps onto the
+        # next row
+        row_corners = (1 << (self.width - width + 1)) - 1
+        matches = 0
+        for row_num in range(self.height - height + 1):
+            matches |= row_corners << (row_num * self.width)
 
-    def _extract_x(self, xpos: int, ypos: int) -> tuple[str, str]:
-        """
-        Extracts the letters in an X around the given position
-        e.g. The given letter and the next one at all diagonals around it
-        Returns a two-tuple of strings of the extracted letters making up each
-        arm of the X
-        If the input position is on an edge, return a tuple of empty strings
-        """
-        arm1 = [(xpos - 1, ypos - 1), (xpos, ypos), (xpos + 1, ypos + 1)]
-        arm2 = [(xpos + 1, ypos - 1), (xpos, ypos), (xpos - 1, ypos + 1)]
-        if self._out_of_bounds(arm1 + arm2):
-            return ("", "")
+        for row_num, row in enumerate(template):
+            for col, char in enumerate(row):
+                if char == WILDCARD:
+                    continue
+                self.stats["plane_shifts"] += 1
+                matches &= self.planes.get(char, 0) >> (row_num * self.width + col)
+                if not matches:
+                    return 0
 
-        return "".join(self.grid[x][y] for x, y in arm1), "".join(
-            self.grid[x][y] for x, y in arm2
-        )
+        return matches.bit_count()
+
+
+def part1_stats(path: str) -> tuple[int, OpStats]:
+    search = WordSearch(path)
+    return search.find_xmas(), search.stats
 
-    def _extract_4(self, xpos: int, ypos: int, xshift: int, yshift: int) -> str:
-        """
-        Extracts the letter at this position of the grid and the next three letters
-        returning them as string
-        xshift and yshift should be one of [-1, 0, 1] and define the direction to extract in
-        If there are not three letters up (i.e. we hit an edge), return an empty string
-        """
-        # Determine the indices we need to extract
-        indexes = [(xpos + (idx * xshift), ypos + (idx * yshift)) for idx in range(4)]
-        # Check if they take us out of bounds
-        if self._out_of_bounds(indexes):
-            return ""
-        return "".join(self.grid[x][y] for x, y in indexes)
-
-    def _out_of_bounds(self, coords: list[tuple[int, int]]) -> bool:
-        """
-        Checks if the given set of coordinates are all within the grid
-        """
-        xbound = [0 <= xpos < len(self.grid) for xpos, _ in coords]
-        ybound = [0 <= ypos < len(self.grid[0]) for _, ypos in coords]
-        return not all(xbound + ybound)
+
+def part2_stats(path: str) -> tuple[int, OpStats]:
+    search = WordSearch(path)
+    return search.find_x_mas(), search.stats
+
+
+@cached_result
+def part1(path: str) -> int:
+    return part1_stats(path)[0]
+
+
+@cached_result
+def part2(path: str) -> int:
+    return part2_stats(path)[0]
 
 
 if __name__ == "__main__":
     path = "inputs/day04"
 
-    wordsearch = WordSearch(path)
-
-    print("Occurances of XMAS:", wordsearch.find_xmas())
-    print("Occurances of X-MAS:", wordsearch.find_x_mas())
+    print("Occurances of XMAS:", part1(path))
+    print("Occurances of X-MAS:", part2(path))
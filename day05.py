@@ -1,6 +1,12 @@
+from array import array
 from collections import defaultdict
 from functools import cmp_to_key
-from typing import Iterable
+from typing import Generator, Iterable, TextIO
+
+from instrument import hot_path
+from packed_inputs import load_packed
+from result_cache import cached_result
+from utils import OpStats
 
 
 class Rules:
@@ -11,6 +17,23 @@ class Rules:
         for before, after in rules:
             self.rules[before].add(after)
 
+        # Each page gets a bit, and each page a bitset of the pages that must appear before it
+        # so the pages of an update that must precede a page is a single AND
+        self._bits: dict[int, int] = {}
+        self._before_bits: dict[int, int] = defaultdict(int)
+        for before, afters in self.rules.items():
+            for after in afters:
+                self._before_bits[after] |= self._bit(before)
+
+        self.stats = OpStats()
+
+    def _bit(self, page: int) -> int:
+        bit = self._bits.get(page)
+        if bit is None:
+            bit = self._bits[page] = 1 << len(self._bits)
+        return bit
+
+    @hot_path
     def check_update(self, update: Iterable[int]) -> bool:
         """
         Check if this update violates any rules, returns False if it does
@@ -18,6 +41,7 @@ class Rules:
         - Fetches rules for that page number
         - Checks if any of the prior looked at page numbers are in the list of "after" pages
         """
+        self.stats["checks"] += 1
         prior = set()
         for page in update:
             after = self.rules[page]
@@ -29,6 +53,7 @@ class Rules:
 
         return True
 
+    @hot_path
     def fix_update(self, update: Iterable[int]) -> list[int]:
         """
         Takes an update that is incorrectly ordered and sorts it into the correct order
@@ -36,6 +61,41 @@ class Rules:
         """
         return sorted(update, key=cmp_to_key(self.compare_pages))
 
+    @hot_path
+    def middle_of_fixed(self, update: list[int]) -> int:
+        """
+        The middle page of an update once fixed, without sorting it
+        When the rules order every pair of pages in the update, a page's position in the fixed
+        update is the number of the update's other pages that must come before it, so the
+        middle page is the one with half of the update before it
+        Those ranks are only trusted if every position is taken exactly once, otherwise
+        the rules don't fully order the update and it falls back to fix_update
+
+        >>> Rules([(1, 2), (2, 3)]).middle_of_fixed([3, 2, 1])
+        2
+        >>> Rules([(1, 2), (2, 3), (3, 4), (4, 5)]).middle_of_fixed([5, 4, 3, 2, 1])
+        3
+        """
+        mask = 0
+        for page in update:
+            mask |= self._bit(page)
+
+        before_bits = self._before_bits
+        ranks = [(before_bits[page] & mask).bit_count() for page in update]
+        middle = len(update) // 2
+        if sorted(ranks) == list(range(len(update))):
+            return update[ranks.index(middle)]
+
+        self.stats["fallback_sorts"] += 1
+        return self.fix_update(update)[middle]
+
+    def middles_of_fixed(self, updates: Iterable[list[int]]) -> Generator[int]:
+        """
+        The middle page of each update once fixed, see middle_of_fixed
+        """
+        for update in updates:
+            yield self.middle_of_fixed(update)
+
     def compare_pages(self, left: int, right: int) -> int:
         """
         Compares two page numbers returning True if left should come before right (i.e. left < right)
@@ -51,44 +111,108 @@ class Rules:
             return 0
 
 
-def parse_input(path: str):
-    rules = []
-    updates = []
+def read_rules(fp: TextIO) -> Generator[tuple[int, int]]:
+    """
+    Lazily read rules from the input, stopping at the blank line separating them from the updates
+    Reads a line at a time with readline, so fp.tell() is left at the first update
+    """
+    for line in iter(fp.readline, ""):
+        if line == "\n":
+            return
+        left, right = line.strip().split("|")
+        yield int(left), int(right)
+
+
+def read_updates(path: str, offset: int) -> Generator[list[int]]:
+    """
+    Lazily read the updates from the input, starting at offset
+    The file is only opened once iteration starts, and closed when the updates run out or the
+    generator is closed or discarded
+    """
     with open(path, "r") as fp:
-        in_rules = True
-        for line in fp.readlines():
-            # The rules and updates are separated by a blank line
-            if line == "\n":
-                in_rules = False
-                continue
+        fp.seek(offset)
+        for line in fp:
+            if line.strip():
+                yield [int(x) for x in line.strip().split(",")]
+
+
+def parse_input(path: str) -> tuple[Generator[list[int]], Rules]:
+    """
+    Reads all the rules, then returns them along with the updates
+    Updates are streamed as they're iterated over, from the packed input if there is one and
+    otherwise from the file, so can only be iterated once
+    """
+    packed = load_packed(path)
+    if packed is not None:
+        return unpack_input(packed)
 
-            if in_rules:
-                left, right = line.strip().split("|")
-                rules.append((int(left), int(right)))
-            else:
-                int_update = [int(x) for x in line.strip().split(",")]
-                updates.append(int_update)
-
-    return updates, Rules(rules)
+    with open(path, "r") as fp:
+        rules = Rules(read_rules(fp))
+        offset = fp.tell()
+    return read_updates(path, offset), rules
 
 
-def main(path: str):
+def pack_input(path: str) -> dict[str, array]:
+    """
+    Flatten the parsed rules and updates into arrays for packed_inputs
+    Updates are stored back to back, update i is values[offsets[i] : offsets[i + 1]]
+    """
     updates, rules = parse_input(path)
 
-    correct_updates = []
-    incorrect_updates = []
+    rule_pairs = array("i")
+    for before, afters in rules.rules.items():
+        for after in afters:
+            rule_pairs.extend((before, after))
+
+    offsets = array("i", [0])
+    values = array("i")
     for update in updates:
-        if rules.check_update(update):
-            correct_updates.append(update)
-        else:
-            incorrect_updates.append(update)
+        values.extend(update)
+        offsets.append(len(values))
+
+    return {"rules": rule_pairs, "update_offsets": offsets, "update_values": values}
+
+
+def unpack_input(packed: dict[str, memoryview]) -> tuple[Generator[list[int]], Rules]:
+    rule_pairs = packed["rules"]
+    offsets = packed["update_offsets"]
+    values = packed["update_values"]
+
+    updates = (values[start:end].tolist() for start, end in zip(offsets, offsets[1:]))
+    return updates, Rules(zip(rule_pairs[::2], rule_pairs[1::2]))
+
+
+def part1_stats(path: str) -> tuple[int, OpStats]:
+    """
+    Sum of the middle value of all correctly ordered updates
+    """
+    updates, rules = parse_input(path)
+    correct_updates = (update for update in updates if rules.check_update(update))
+    return sum(update[len(update) // 2] for update in correct_updates), rules.stats
 
-    middles = sum(update[len(update) // 2] for update in correct_updates)
-    print("Sum of the middle value of all correct updates:", middles)
 
-    fixed_updates = [rules.fix_update(update) for update in incorrect_updates]
-    middles = sum(update[len(update) // 2] for update in fixed_updates)
-    print("Sum of the middle value of all fixed updates:", middles)
+def part2_stats(path: str) -> tuple[int, OpStats]:
+    """
+    Sum of the middle value of all incorrectly ordered updates, once fixed
+    """
+    updates, rules = parse_input(path)
+    incorrect_updates = (update for update in updates if not rules.check_update(update))
+    return sum(rules.middles_of_fixed(incorrect_updates)), rules.stats
+
+
+@cached_result
+def part1(path: str) -> int:
+    return part1_stats(path)[0]
+
+
+@cached_result
+def part2(path: str) -> int:
+    return part2_stats(path)[0]
+
+
+def main(path: str):
+    print("Sum of the middle value of all correct updates:", part1(path))
+    print("Sum of the middle value of all fixed updates:", part2(path))
 
 
 if __name__ == "__main__":
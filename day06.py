@@ -1,7 +1,11 @@
-from concurrent.futures import ProcessPoolExecutor
-from functools import partial
+from array import array
+from copy import copy
+from functools import cache, partial
 
-from utils import BoundedGrid, XYCoord
+from instrument import hot_path
+from packed_inputs import load_packed
+from result_cache import cached_result
+from utils import BoundedGrid, OpStats, XYCoord
 
 LOOP = object()
 
@@ -20,18 +24,28 @@ class LabMap(BoundedGrid):
         # Assume the guard is always facing up to start
         self.guard_facing = self.up
 
-        with open(path, "r") as fp:
-            for i, line in enumerate(fp.readlines()):  # i == y
-                for j, char in enumerate(line):  # j == x
-                    if char == "#":
-                        obstacles.append(XYCoord(j, i))
-                    elif char == "^":
-                        self.guard = XYCoord(j, i)
+        packed = load_packed(path)
+        if packed is not None:
+            j, i, guard_x, guard_y = packed["layout"]
+            self.guard = XYCoord(guard_x, guard_y)
+            coords = packed["obstacles"]
+            obstacles = [XYCoord(x, y) for x, y in zip(coords[::2], coords[1::2])]
+        else:
+            with open(path, "r") as fp:
+                for i, line in enumerate(fp.readlines()):  # i == y
+                    for j, char in enumerate(line):  # j == x
+                        if char == "#":
+                            obstacles.append(XYCoord(j, i))
+                        elif char == "^":
+                            self.guard = XYCoord(j, i)
 
         super().__init__(j, i)
 
         self.obstacles = obstacles
+        # Steps and turns are only counted when given an OpStats, e.g. by part1_stats
+        self.stats: OpStats | None = None
 
+    @hot_path
     def walk_guard(self) -> set[XYCoord] | object:
         """
         Have the guard patrol around the map until it exits the area
@@ -81,6 +95,8 @@ class LabMap(BoundedGrid):
         new_pos = self.guard + self.guard_facing
 
         if new_pos in self.obstacles:
+            if self.stats is not None:
+                self.stats["turns"] += 1
             match self.guard_facing:
                 case self.up:
                     self.guard_facing = self.right
@@ -91,19 +107,50 @@ class LabMap(BoundedGrid):
                 case self.left:
                     self.guard_facing = self.up
         else:
+            if self.stats is not None:
+                self.stats["steps"] += 1
             self.guard = new_pos
 
 
-def test_new_obstacle(pos, path):
-    test_map = LabMap(path)
-    test_map.obstacles.append(pos)
-    return test_map.walk_guard()
+def pack_input(path: str) -> dict[str, array]:
+    """
+    The parsed map as arrays for packed_inputs
+    """
+    map = LabMap(path)
+    layout = array("i", [map.max_x, map.max_y, map.guard.x, map.guard.y])
+    obstacles = array("i")
+    for obstacle in map.obstacles:
+        obstacles.extend((obstacle.x, obstacle.y))
+    return {"layout": layout, "obstacles": obstacles}
+
+
+@cache
+def _template_map(path: str) -> LabMap:
+    """
+    The map as loaded from path, parsed once per process and copied for each trial
+    """
+    return LabMap(path)
+
 
+@hot_path
+def test_new_obstacle(pos, path, counted: bool = False) -> tuple[bool, OpStats | None]:
+    """
+    Walk the guard with a new obstacle at pos
+    Returns whether the guard ended up in a loop and, if counted, the stats for the walk
+    """
+    test_map = copy(_template_map(path))
+    test_map.obstacles = [*test_map.obstacles, pos]
+    test_map.stats = OpStats() if counted else None
+    looped = test_map.walk_guard() is LOOP
+    return looped, test_map.stats
 
-def introduce_obstacles(path) -> int:
+
+@hot_path
+def introduce_obstacles(path, stats: OpStats | None = None) -> int:
     """
     To a LabMap, add obstacles into the guard's path to determine if it forces the guard
     into a loop
+    If given stats, it is updated with the totals across every trial walk
     """
     map = LabMap(path)
     start = map.guard
@@ -111,25 +158,230 @@ def introduce_obstacles(path) -> int:
     assert isinstance(visited, set)
     visited.remove(start)
 
-    partial_test = partial(test_new_obstacle, path=path)
+    partial_test = partial(test_new_obstacle, path=path, counted=stats is not None)
+
+    # Only pay for importing concurrent.futures when the obstacles are actually being tested
+    from concurrent.futures import ProcessPoolExecutor
 
     num_loops = 0
     with ProcessPoolExecutor() as executor:
-        for res in executor.map(partial_test, visited):
-            if not isinstance(res, set):
+        for looped, trial_stats in executor.map(partial_test, visited):
+            if looped:
                 num_loops += 1
+            if stats is not None:
+                stats["trials"] += 1
+                stats.update(trial_stats)  # type: ignore[arg-type]
 
     return num_loops
 
 
-if __name__ == "__main__":
-    path = "inputs/day06"
+# Headings in clockwise order, so turning right is the next heading
+HEADINGS = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+EXIT = -1
+
+
+class GuardBatch:
+    """
+    Many independent guards patrolling the same lab map, advanced together in lockstep sweeps
+    Each guard has its own start, heading and optionally one extra obstacle, e.g. one guard per
+    obstacle trial or one per start position
+
+    Rather than stepping a cell at a time, every sweep moves each guard straight to its next turn
+    using a jump table shared by all guards, correcting for the guard's extra obstacle when it
+    is in the way
+    A guard that revisits a turn, at the same cell and heading, is in a loop
+    Guards that exit or loop are dropped from the sweeps
+
+    The jump table only depends on the map, so can be passed in from an earlier batch on the
+    same map rather than built again
+    """
+
+    def __init__(self, map: LabMap, jumps: array | None = None):
+        self.width = map.max_x + 1
+        self.height = map.max_y + 1
+        if jumps is None:
+            blocked = bytearray(self.width * self.height)
+            for obstacle in map.obstacles:
+                if map._within_bounds(obstacle):
+                    blocked[obstacle.y * self.width + obstacle.x] = 1
+            jumps = self._build_jumps(blocked)
+        self.jumps = jumps
+
+        self.cells = array("i")
+        self.headings = array("b")
+        self.extras = array("i")
+        self.looped: list[bool | None] = []
+        self.stats = OpStats()
+
+    def _build_jumps(self, blocked: bytearray) -> array:
+        """
+        For every cell and heading, the cell the guard stops at in front of an obstacle,
+        or EXIT if it walks off the map first
+        Indexed by cell * 4 + heading
+        """
+        width, height = self.width, self.height
+        jumps = array("i", [EXIT]) * (width * height * len(HEADINGS))
+        for heading, (dx, dy) in enumerate(HEADINGS):
+            # Visit cells so the one ahead of each is always done before it
+            xs = range(width - 1, -1, -1) if dx > 0 else range(width)
+            ys = range(height - 1, -1, -1) if dy > 0 else range(height)
+            for y in ys:
+                for x in xs:
+                    ahead_x, ahead_y = x + dx, y + dy
+                    if not (0 <= ahead_x < width and 0 <= ahead_y < height):
+                        continue
+                    ahead = ahead_y * width + ahead_x
+                    cell = y * width + x
+                    if blocked[ahead]:
+                        jumps[cell * 4 + heading] = cell
+                    else:
+                        jumps[cell * 4 + heading] = jumps[ahead * 4 + heading]
+        return jumps
+
+    def add_guard(
+        self, pos: XYCoord, heading: int = 0, extra: XYCoord | None = None
+    ) -> int:
+        """
+        Add a guard at pos facing the heading, an index into HEADINGS, with an optional
+        obstacle that only this guard sees
+        Returns the guard's index
+        """
+        self.cells.append(pos.y * self.width + pos.x)
+        self.headings.append(heading)
+        self.extras.append(EXIT if extra is None else extra.y * self.width + extra.x)
+        self.looped.append(None)
+        return len(self.looped) - 1
+
+    @hot_path
+    def run(self) -> list[bool]:
+        """
+        Sweep until every guard has exited or looped
+        Returns whether each guard looped, in the order they were added
+        """
+        jumps, cells, headings = self.jumps, self.cells, self.headings
+        active = [guard for guard, looped in enumerate(self.looped) if looped is None]
+        seen: list[set[int]] = [set() for _ in self.looped]
+
+        while active:
+            self.stats["sweeps"] += 1
+            # Every active guard takes one jump this sweep
+            self.stats["jumps"] += len(active)
+            still_active = []
+            for guard in active:
+                cell, heading = cells[guard], headings[guard]
+                stop = jumps[cell * 4 + heading]
+
+                extra = self.extras[guard]
+                if extra != EXIT:
+                    stop = self._stop_before(cell, heading, stop, extra)
+
+                if stop == EXIT:
+                    self.looped[guard] = False
+                    continue
+
+                heading = (heading + 1) % 4
+                state = stop * 4 + heading
+                if state in seen[guard]:
+                    self.looped[guard] = True
+                    continue
+                seen[guard].add(state)
+                cells[guard], headings[guard] = stop, heading
+                still_active.append(guard)
+            active = still_active
+
+        return self.looped  # type: ignore[return-value]
+
+    def _stop_before(self, cell: int, heading: int, stop: int, extra: int) -> int:
+        """
+        Where a guard walking from cell stops, given the stop from the jump table and
+        an extra obstacle which may be in the way first
+        """
+        y, x = divmod(cell, self.width)
+        extra_y, extra_x = divmod(extra, self.width)
+        dx, dy = HEADINGS[heading]
+        # Only an obstacle ahead, in line with the guard, can stop them
+        if dx == 0 and extra_x != x or dy == 0 and extra_y != y:
+            return stop
+        distance = (extra_x - x) * dx + (extra_y - y) * dy
+        if distance <= 0:
+            return stop
+        if stop != EXIT:
+            stop_y, stop_x = divmod(stop, self.width)
+            if distance > (stop_x - x) * dx + (stop_y - y) * dy:
+                return stop
+        return cell + (distance - 1) * (dy * self.width + dx)
+
+
+@hot_path
+def introduce_obstacles_batched(path, stats: OpStats | None = None) -> int:
+    """
+    introduce_obstacles, with every trial walked together in one GuardBatch in this process
+    If given stats, it is updated with the batch's sweep and jump counts
+    """
+    return count_loop_obstacles(LabMap(path), stats)
+
+
+def count_loop_obstacles(
+    map: LabMap, stats: OpStats | None = None, jumps: array | None = None
+) -> int:
+    """
+    introduce_obstacles_batched for an already loaded map, which is left unchanged
+    Optionally reusing the jump table of an earlier GuardBatch on the map
+    """
+    # Walking moves the guard, so walk a copy, without counting into the original's stats
+    map = copy(map)
+    map.stats = None
+    start = map.guard
+    visited = map.walk_guard()
+    assert isinstance(visited, set)
+    visited.remove(start)
+
+    batch = GuardBatch(map, jumps)
+    for pos in visited:
+        batch.add_guard(start, extra=pos)
+    num_loops = sum(batch.run())
+
+    if stats is not None:
+        stats["trials"] += len(visited)
+        stats.update(batch.stats)
+    return num_loops
+
 
+def walked_tiles(path: str, stats: OpStats | None = None) -> int:
+    """
+    The number of tiles the guard visits before leaving the map
+    If given stats, counts the guard's steps and turns
+    """
     map = LabMap(path)
+    map.stats = stats
 
     visited_tiles = map.walk_guard()
     assert isinstance(visited_tiles, set)
-    print("Number of distinct positions visited:", len(visited_tiles))
+    return len(visited_tiles)
+
+
+def part1_stats(path: str) -> tuple[int, OpStats]:
+    stats = OpStats()
+    return walked_tiles(path, stats), stats
+
+
+def part2_stats(path: str) -> tuple[int, OpStats]:
+    stats = OpStats()
+    return introduce_obstacles_batched(path, stats), stats
+
+
+@cached_result
+def part1(path: str) -> int:
+    return walked_tiles(path)
+
+
+@cached_result
+def part2(path: str) -> int:
+    return introduce_obstacles_batched(path)
+
+
+if __name__ == "__main__":
+    path = "inputs/day06"
 
-    num_loops = introduce_obstacles(path)
-    print("Number of positions we can place an obstacle:", num_loops)
+    print("Number of distinct positions visited:", part1(path))
+    print("Number of positions we can place an obstacle:", part2(path))
@@ -1,7 +1,14 @@
+from array import array
 from dataclasses import dataclass
 from functools import partial
 from itertools import product
 from operator import add, mul
+from typing import Generator, Iterable
+
+from instrument import hot_path
+from packed_inputs import load_packed
+from result_cache import cached_result
+from utils import OpStats
 
 
 @dataclass
@@ -10,15 +17,49 @@ class Equation:
     values: tuple[int, ...]
 
 
-def load_data(path: str) -> list[Equation]:
-    equations = []
+def iter_equations(path: str) -> Generator[Equation]:
+    """
+    Lazily read the equations from the input one line at a time
+    """
+    packed = load_packed(path)
+    if packed is not None:
+        yield from unpack_data(packed)
+        return
+
     with open(path, "r") as fp:
-        for line in fp.readlines():
+        for line in fp:
             result, values_str = line.strip().split(":")
             values = values_str.strip().split(" ")
             values_int = tuple(int(val) for val in values)
-            equations.append(Equation(result=int(result), values=values_int))
-    return equations
+            yield Equation(result=int(result), values=values_int)
+
+
+def load_data(path: str) -> list[Equation]:
+    return list(iter_equations(path))
+
+
+def pack_input(path: str) -> dict[str, array]:
+    """
+    Flatten the parsed equations into arrays for packed_inputs
+    The values of equation i are values[offsets[i] : offsets[i + 1]]
+    """
+    results = array("q")
+    offsets = array("i", [0])
+    values = array("q")
+    for equation in iter_equations(path):
+        results.append(equation.result)
+        values.extend(equation.values)
+        offsets.append(len(values))
+    return {"results": results, "offsets": offsets, "values": values}
+
+
+def unpack_data(packed: dict[str, memoryview]) -> Iterable[Equation]:
+    offsets = packed["offsets"]
+    values = packed["values"]
+    return (
+        Equation(result=result, values=tuple(values[start:end]))
+        for result, start, end in zip(packed["results"], offsets, offsets[1:])
+    )
 
 
 def concatenate(a: int, b: int) -> int:
@@ -29,10 +70,15 @@ def concatenate(a: int, b: int) -> int:
     return int(str(a) + str(b))
 
 
-def is_valid_equation(equation: Equation, with_concat: bool = False) -> bool:
+@hot_path
+def is_valid_equation(
+    equation: Equation, with_concat: bool = False, stats: OpStats | None = None
+) -> bool:
     """
     Determine if this equation can be made valid by inserting addition, multiplication,
     or concatenation operators between the values
+    If given stats, counts the operator permutations tried, once the search is over so the
+    search itself is no slower
     """
     operators = [add, mul]
     if with_concat:
@@ -42,21 +88,55 @@ def is_valid_equation(equation: Equation, with_concat: bool = False) -> bool:
         for val, operator in zip(equation.values[1:], operator_perm):
             running_total = operator(running_total, val)
         if running_total == equation.result:
-            return True
-    return False
+            break
+    else:
+        if stats is not None:
+            stats["permutations"] += len(operators) ** (len(equation.values) - 1)
+        return False
 
+    if stats is not None:
+        # product tries the permutations in order, so the one that worked, read as a number
+        # in base len(operators), is how many were tried before it
+        tried = 0
+        for operator in operator_perm:
+            tried = tried * len(operators) + operators.index(operator)
+        stats["permutations"] += tried + 1
+    return True
+
+
+def calibration_total(
+    path: str, with_concat: bool = False, stats: OpStats | None = None
+) -> int:
+    """
+    The sum of the results of the equations that can be made valid
+    """
+    valid = partial(is_valid_equation, with_concat=with_concat, stats=stats)
+    return sum(eq.result for eq in filter(valid, iter_equations(path)))
+
+
+def part1_stats(path: str) -> tuple[int, OpStats]:
+    stats = OpStats()
+    return calibration_total(path, stats=stats), stats
 
-def main(path: str):
-    equations = load_data(path)
 
-    valid_eqs = filter(is_valid_equation, equations)
-    summed_results = sum(eq.result for eq in valid_eqs)
-    print("Total calibration results:", summed_results)
+def part2_stats(path: str) -> tuple[int, OpStats]:
+    stats = OpStats()
+    return calibration_total(path, with_concat=True, stats=stats), stats
 
-    valid_concat = partial(is_valid_equation, with_concat=True)
-    valid_eqs = filter(valid_concat, equations)
-    summed_results = sum(eq.result for eq in valid_eqs)
-    print("Total calibration results with concatenation:", summed_results)
+
+@cached_result
+def part1(path: str) -> int:
+    return calibration_total(path)
+
+
+@cached_result
+def part2(path: str) -> int:
+    return calibration_total(path, with_concat=True)
+
+
+def main(path: str):
+    print("Total calibration results:", part1(path))
+    print("Total calibration results with concatenation:", part2(path))
 
 
 if __name__ == "__main__":
@@ -2,7 +2,9 @@ from collections import defaultdict
 from dataclasses import dataclass
 from itertools import combinations
 
-from utils import BoundedGrid, XYCoord
+from instrument import hot_path
+from result_cache import cached_result
+from utils import BoundedGrid, OpStats, XYCoord
 
 
 @dataclass(frozen=True)
@@ -29,7 +31,9 @@ class AntennaMap(BoundedGrid):
                         self.antennae[char].append(Antenna(j, i))
 
         super().__init__(j, i)
+        self.stats = OpStats()
 
+    @hot_path
     def find_antinodes(self) -> int:
         """
         Find all antinodes on the map
@@ -38,6 +42,7 @@ class AntennaMap(BoundedGrid):
         all_antis = set()
         for freq, antennae in self.antennae.items():
             for a, b in combinations(antennae, 2):
+                self.stats["pairs"] += 1
                 a_anti = a.antinode(b)
                 b_anti = b.antinode(a)
                 if self._within_bounds(a_anti):
@@ -47,6 +52,7 @@ class AntennaMap(BoundedGrid):
 
         return len(all_antis)
 
+    @hot_path
     def find_resonant_antinodes(self) -> int:
         """
         Find all antinodes on the map, taking into account resonant harmonics
@@ -59,6 +65,7 @@ class AntennaMap(BoundedGrid):
 
         for freq, antennae in self.antennae.items():
             for a, b in combinations(antennae, 2):
+                self.stats["pairs"] += 1
                 # The positions of the two antennae are themselves antinodes
                 all_antis.update([a.as_xycoord(), b.as_xycoord()])
 
@@ -66,6 +73,7 @@ class AntennaMap(BoundedGrid):
                 dist = a - b
                 antinode = a + dist
                 while self._within_bounds(antinode):
+                    self.stats["harmonics"] += 1
                     all_antis.add(antinode)
                     antinode = antinode + dist
 
@@ -73,18 +81,35 @@ class AntennaMap(BoundedGrid):
                 dist = b - a
                 antinode = b + dist
                 while self._within_bounds(antinode):
+                    self.stats["harmonics"] += 1
                     all_antis.add(antinode)
                     antinode = antinode + dist
 
         return len(all_antis)
 
 
+def part1_stats(path: str) -> tuple[int, OpStats]:
+    antenna_map = AntennaMap(path)
+    return antenna_map.find_antinodes(), antenna_map.stats
+
+
+def part2_stats(path: str) -> tuple[int, OpStats]:
+    antenna_map = AntennaMap(path)
+    return antenna_map.find_resonant_antinodes(), antenna_map.stats
+
+
+@cached_result
+def part1(path: str) -> int:
+    return part1_stats(path)[0]
+
+
+@cached_result
+def part2(path: str) -> int:
+    return part2_stats(path)[0]
+
+
 if __name__ == "__main__":
     path = "inputs/day08"
-    map = AntennaMap(path)
-
-    all_found = map.find_antinodes()
-    print("Number of identified antinodes:", all_found)
 
-    found = map.find_resonant_antinodes()
-    print("Number of resonant antinodes identified:", found)
+    print("Number of identified antinodes:", part1(path))
+    print("Number of resonant antinodes identified:", part2(path))
@@ -1,22 +1,213 @@
-import heapq
-from collections import defaultdict
+import struct
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from itertools import count, repeat
+from operator import mul
+from typing import Generator, Iterable
 
-EMPTY = "."
+from instrument import hot_path
+from result_cache import cached_result
+from utils import OpStats
+
+# Block maps are stored as a typed array of file IDs, with EMPTY as the sentinel for free blocks
+EMPTY = -1
+BLOCK_TYPECODE = "i"
+
+
+def render(block_map: array) -> str:
+    """
+    Renders a block map in the puzzle's text format, with a period for each empty block
+    """
+    return "".join("." if block == EMPTY else str(block) for block in block_map)
+
+
+@dataclass
+class Extent:
+    """
+    A contiguous run of blocks on the disk belonging to a single file
+    Free space is represented with a file_id of EMPTY
+    """
+
+    file_id: int
+    start: int
+    length: int
+
+    @property
+    def end(self) -> int:
+        return self.start + self.length
+
+    @property
+    def checksum(self) -> int:
+        """
+        The checksum contribution of this extent
+        Sum of position * file_id over the run, using the arithmetic series for the positions
+        """
+        if self.file_id == EMPTY:
+            return 0
+        return self.file_id * (self.length * (2 * self.start + self.length - 1) // 2)
+
+
+@dataclass(frozen=True)
+class Move:
+    """
+    A single move of length blocks of a file from one position on the disk to another
+    """
+
+    file_id: int
+    source: int
+    dest: int
+    length: int
+
+
+class MoveTrace:
+    """
+    Records the moves made by a drive as compact events in a bounded ring buffer
+    Recording is O(1) per move, rendering the disk is left to replay after the fact
+    Once maxlen events have been recorded, the oldest are dropped
+    """
+
+    # Each event is packed as four little endian signed 64 bit ints
+    RECORD = struct.Struct("<4q")
+
+    def __init__(self, maxlen: int | None = 1_000_000):
+        self.events: deque[Move] = deque(maxlen=maxlen)
+        self.recorded = 0
+
+    def record(self, file_id: int, source: int, dest: int, length: int) -> None:
+        self.events.append(Move(file_id, source, dest, length))
+        self.recorded += 1
+
+    @property
+    def dropped(self) -> int:
+        """
+        The number of events that have fallen out of the ring buffer
+        """
+        return self.recorded - len(self.events)
+
+    def dump(self, path: str) -> None:
+        """
+        Write the buffered events to a binary log file
+        """
+        with open(path, "wb") as fp:
+            for move in self.events:
+                fp.write(
+                    self.RECORD.pack(move.file_id, move.source, move.dest, move.length)
+                )
+
+    @classmethod
+    def load(cls, path: str) -> "MoveTrace":
+        """
+        Read a binary log file written by dump
+        """
+        trace = cls(maxlen=None)
+        with open(path, "rb") as fp:
+            for fields in cls.RECORD.iter_unpack(fp.read()):
+                trace.record(*fields)
+        return trace
+
+
+def replay(disk_map: str, moves: Iterable[Move]) -> Generator[str]:
+    """
+    Replays a complete trace against the disk map it was recorded from
+    Yields the rendered block map before any moves and then after each move
+    """
+    block_map = HardDrive(disk_map).block_map
+    yield render(block_map)
+
+    for move in moves:
+        block_map[move.source : move.source + move.length] = (
+            array(BLOCK_TYPECODE, [EMPTY]) * move.length
+        )
+        block_map[move.dest : move.dest + move.length] = (
+            array(BLOCK_TYPECODE, [move.file_id]) * move.length
+        )
+        yield render(block_map)
+
+
+class FreeSpanTree:
+    """
+    A max segment tree over the lengths of free spans, ordered by their position on the disk
+    Finding the leftmost span of at least a given size and shrinking a span are both O(log n)
+    in the number of spans
+    """
+
+    def __init__(self, spans: list[Extent]):
+        self.spans = spans
+
+        # Pad the leaves out to a power of two, each internal node holds the max of its children
+        size = 1
+        while size < len(spans):
+            size *= 2
+        self.size = size
+
+        tree = [0] * (2 * size)
+        for i, span in enumerate(spans):
+            tree[size + i] = span.length
+        for node in range(size - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self.tree = tree
+
+    def find_first(self, length: int, before: int) -> int:
+        """
+        Finds the index of the leftmost free span that can hold length blocks and starts before
+        the given position
+        If no suitable span exists, raises an IndexError
+        """
+        tree = self.tree
+        if tree[1] < length:
+            raise IndexError
+
+        # Descend towards the leftmost leaf with enough room
+        node = 1
+        while node < self.size:
+            node = 2 * node
+            if tree[node] < length:
+                node += 1
+
+        index = node - self.size
+        # As this is the leftmost fit, no span before it can be suitable either
+        if self.spans[index].start >= before:
+            raise IndexError
+
+        return index
+
+    def allocate(self, index: int, length: int) -> int:
+        """
+        Takes length blocks from the front of the span at index
+        Returns the position the allocated blocks start at
+        """
+        span = self.spans[index]
+        start = span.start
+        span.start += length
+        span.length -= length
+
+        node = self.size + index
+        self.tree[node] = span.length
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+        return start
 
 
 class HardDrive:
-    def __init__(self, disk_map: str):
+    def __init__(self, disk_map: str, trace: MoveTrace | None = None):
         self.disk_map = disk_map
+        self.trace = trace
+        self.stats = OpStats()
         self._disk_map_to_block_map()
-        self._init_empty_map()
+        self._init_free_spans()
 
     def _disk_map_to_block_map(self):
         """
         Reads a disk map dense format and converts it into a block map format
-        In the block map a number indicates a file ID and a period indicates an empty block
+        In the block map a number indicates a file ID and EMPTY indicates an empty block
         disk map 12345 -> block map 0..111....22222
         """
-        block_map = []
+        block_map = array(BLOCK_TYPECODE)
+        empty = array(BLOCK_TYPECODE, [EMPTY])
         current_id = 0
 
         for i, digit in enumerate(self.disk_map):
@@ -24,87 +215,86 @@ class HardDrive:
 
             # If odd, this represents free space
             if i % 2:
-                block_map.extend([EMPTY] * digit)
+                block_map.extend(empty * digit)
             else:
                 # Even represents a file
-                block_map.extend([current_id] * digit)
+                block_map.extend(array(BLOCK_TYPECODE, [current_id]) * digit)
                 current_id += 1
 
         self.block_map = block_map
 
-    def _init_empty_map(self) -> None:
+    def _init_free_spans(self) -> None:
         """
-        For faster lookups later, build a map of size of empty blocks to their positions
-        This will be a dict keyed on empty block size with values as a heapq of the starting
-        position for each of these blocks
+        For faster lookups later, build an index of all the runs of empty blocks
+        This is a FreeSpanTree over the empty runs in position order
         """
-        empty_map = defaultdict(list)
+        spans = []
 
         # Iterate over the block map to identify each empty block
-        prev_block = None
-        size = 0  # size of the current empty block
-        start = 0  # start position of the current empty block
         for i, block in enumerate(self.block_map):
-            if block == EMPTY:
-                if prev_block != EMPTY:
-                    # Start of a fresh empty block
-                    start = i
-                    size = 1
-                else:
-                    # Grow the size of the current block
-                    size += 1
-            else:  # Not an empty block
-                if prev_block == EMPTY:
-                    # We hit the end of an empty block
-                    heapq.heappush(empty_map[size], start)
-
-            prev_block = block
-
-        self.empty_map = empty_map
-
-    def _update_empty_map(self, pos: int) -> None:
-        """
-        Updates the empty map with the empty block starting at pos
-        """
-        assert self.block_map[pos] == EMPTY
-        size = 1
-
-        for block in self.block_map[pos + 1 :]:
-            if block == EMPTY:
-                size += 1
+            if block != EMPTY:
+                continue
+            if spans and spans[-1].end == i:
+                # Grow the size of the current block
+                spans[-1].length += 1
             else:
-                break
+                # Start of a fresh empty block
+                spans.append(Extent(EMPTY, i, 1))
 
-        heapq.heappush(self.empty_map[size], pos)
+        self.free_spans = FreeSpanTree(spans)
 
+    @hot_path
     def compact_disk(self, verbose: bool = False):
         """
         Compacts the disk by moving blocks from the right to empty spaces on the left
         e.g.
         0..111....22222
-        02.111....2222.
         022111....222..
-        0221112...22...
+        022111222......
+
+        Each iteration moves the whole overlap of the leftmost gap and the rightmost run of
+        file blocks, so the cost is proportional to the number of runs rather than blocks
         """
+        block_map = self.block_map
         if verbose:
-            print("".join(map(str, self.block_map)))
+            print(render(block_map))
 
         # Initialize two pointers at the left and right ends of the map
-        left = self.next_empty(0)
-        right = self.last_used(len(self.block_map) - 1)
-        while left < right:
-            # Copy the value of right into left
-            # Then set right to empty
-            self.block_map[left] = self.block_map[right]
-            self.block_map[right] = EMPTY
+        try:
+            left = self.next_empty(0)
+            right = self.last_used(len(block_map) - 1)
+        except ValueError:
+            # Either a full disk or an empty one, neither can be compacted
+            return
 
-            # Update the pointers before the next iteration
-            left = self.next_empty(left)
-            right = self.last_used(right)
+        while left < right:
+            # Measure the gap starting at left, it can't run past right
+            gap_end = left + 1
+            while gap_end < right and block_map[gap_end] == EMPTY:
+                gap_end += 1
+
+            # Measure the run of the same file ending at right
+            file_id = block_map[right]
+            run_start = right
+            while run_start > gap_end and block_map[run_start - 1] == file_id:
+                run_start -= 1
+
+            # Copy the overlap of the two into the gap
+            # Then set the end of the run to empty
+            size = min(gap_end - left, right + 1 - run_start)
+            self._move_blocks(file_id, right + 1 - size, left, size)
 
             if verbose:
-                print("".join(map(str, self.block_map)))
+                print(render(block_map))
+
+            # Update the pointers before the next iteration
+            try:
+                left = self.next_empty(left + size)
+                right = self.last_used(right - size)
+            except ValueError:
+                break
 
+    @hot_path
     def defrag_disk_optimized(self, verbose: bool = False):
         """
         Compacts the disk without fragmenting by files by keeping files in contiguous blocks
@@ -117,7 +307,7 @@ class HardDrive:
         """
         moved_files = set()
         if verbose:
-            print("".join(map(str, self.block_map)))
+            print(render(self.block_map))
 
         start, size = self.last_file(len(self.block_map) - 1)
 
@@ -125,11 +315,14 @@ class HardDrive:
             file_id = self.block_map[start]
             # If we've already moved this file, don't try to again
             if file_id in moved_files:
-                start, size = self.last_file(start - 1)
+                try:
+                    start, size = self.last_file(start - 1)
+                except ValueError:
+                    break
                 continue
 
             try:
-                avail_empty = self.find_first_suitable(size)
+                avail_empty = self.find_first_suitable(size, start)
             except IndexError:
                 # If we didn't find an approriate empty block
                 # set avail_empty to size, which skips the next block
@@ -137,17 +330,9 @@ class HardDrive:
 
             # Only copy a file into an empty block if it appears before the file
             if avail_empty < start:
-                # Copy the file into the empty block
-                # Then set the original file location to empty
-                self.block_map[avail_empty : avail_empty + size] = [file_id] * size
-                self.block_map[start : start + size] = [EMPTY] * size
+                self._move_blocks(file_id, start, avail_empty, size)
                 moved_files.add(file_id)
 
-                # Update the empty map if there is any remaining empty space after moving the file
-                empty_start = avail_empty + size
-                if self.block_map[empty_start] == EMPTY:
-                    self._update_empty_map(empty_start)
-
             # Find the next file before restarting the loop
             try:
                 start, size = self.last_file(start - 1)
@@ -156,29 +341,22 @@ class HardDrive:
                 break
 
             if verbose:
-                print("".join(map(str, self.block_map)))
+                print(render(self.block_map))
 
-    def find_first_suitable(self, size: int) -> int:
+    @hot_path
+    def find_first_suitable(self, size: int, before: int) -> int:
         """
-        Uses the empty block map to find the first empty block that can accomodate
-        a file of size
-        Returns the starting position of the empty block, popping it off the appropriate heap
+        Uses the free span index to find the first empty block that can accomodate
+        a file of size and starts before the given position
+        Returns the starting position of the empty block, claiming it in the index
         If no suitiable empty block is found, raises an IndexError
         """
-        found_size = None
-        found_pos = len(self.block_map)
-        for a_size, heap in self.empty_map.items():
-            if len(heap) == 0:
-                continue
-            if a_size >= size and heap[0] < found_pos:
-                found_size = a_size
-                found_pos = heap[0]
-
-        if found_size is None:
-            raise IndexError
-
-        return heapq.heappop(self.empty_map[found_size])
+        self.stats["span_lookups"] += 1
+        index = self.free_spans.find_first(size, before)
+        self.stats["span_allocations"] += 1
+        return self.free_spans.allocate(index, size)
 
+    @hot_path
     def defrag_disk(self, verbose: bool = False):
         """
         Compacts the disk without fragmenting by files by keeping files in contiguous blocks
@@ -195,7 +373,7 @@ class HardDrive:
         """
         moved_files = set()
         if verbose:
-            print("".join(map(str, self.block_map)))
+            print(render(self.block_map))
 
         start, size = self.last_file(len(self.block_map) - 1)
 
@@ -216,10 +394,7 @@ class HardDrive:
 
             # Only copy a file into an empty block if it appears before the file
             if avail_empty < start:
-                # Copy the file into the empty block
-                # Then set the original file location to empty
-                self.block_map[avail_empty : avail_empty + size] = [file_id] * size
-                self.block_map[start : start + size] = [EMPTY] * size
+                self._move_blocks(file_id, start, avail_empty, size)
                 moved_files.add(file_id)
 
             # Find the next file before restarting the loop
@@ -230,14 +405,27 @@ class HardDrive:
                 break
 
             if verbose:
-                print("".join(map(str, self.block_map)))
+                print(render(self.block_map))
+
+    def _move_blocks(self, file_id: int, source: int, dest: int, size: int) -> None:
+        """
+        Copy size blocks of a file from source into the empty blocks at dest
+        Then set the original location to empty, recording the move if tracing
+        """
+        self.block_map[dest : dest + size] = array(BLOCK_TYPECODE, [file_id]) * size
+        self.block_map[source : source + size] = array(BLOCK_TYPECODE, [EMPTY]) * size
+        self.stats["moves"] += 1
+        self.stats["blocks_moved"] += size
+
+        if self.trace is not None:
+            self.trace.record(file_id, source, dest, size)
 
     def next_empty(self, start: int) -> int:
         """
         Finds the position of the next empty block starting at start
         """
-        for i, block in enumerate(self.block_map[start:], start=start):
-            if block == EMPTY:
+        for i in range(start, len(self.block_map)):
+            if self.block_map[i] == EMPTY:
                 return i
         raise ValueError(f"No empty blocks found after {start}")
 
@@ -245,8 +433,8 @@ class HardDrive:
         """
         Finds the position of the last used block starting at start and working backwards
         """
-        for i in range(start, 0, -1):
-            if isinstance(self.block_map[i], int):
+        for i in range(start, -1, -1):
+            if self.block_map[i] != EMPTY:
                 return i
         raise ValueError(f"No used blocks found before {start}")
 
@@ -301,30 +489,186 @@ class HardDrive:
     def checksum(self) -> int:
         """
         Compute the checksum of the disk by summing the product of each blocks position and file ID
+        Clamping EMPTY up to 0 drops empty blocks out of the dot product, keeping the whole
+        computation inside C level iterators
+        """
+        return sum(map(mul, count(), map(max, self.block_map, repeat(0))))
+
+
+class ExtentDrive:
+    """
+    An alternative to HardDrive which never expands the disk map into individual blocks
+    The disk is kept as a list of file extents and a list of free spans, both ordered by position
+    so memory and runtime scale with the number of extents rather than the number of blocks
+    """
+
+    def __init__(self, disk_map: str, trace: MoveTrace | None = None):
+        self.disk_map = disk_map
+        self.trace = trace
+        self.stats = OpStats()
+        self._disk_map_to_extents()
+
+    def _disk_map_to_extents(self) -> None:
+        """
+        Reads a disk map dense format and converts it into file extents and free spans
+        disk map 12345 -> files [(0, 0, 1), (1, 3, 3), (2, 10, 5)], free [(., 1, 2), (., 6, 4)]
+        """
+        files = []
+        free = []
+        pos = 0
+        current_id = 0
+
+        for i, digit in enumerate(self.disk_map):
+            digit = int(digit)
+
+            # If odd, this represents free space
+            if i % 2:
+                if free and free[-1].end == pos:
+                    # A zero length file between two free spans merges them
+                    free[-1].length += digit
+                elif digit:
+                    free.append(Extent(EMPTY, pos, digit))
+            else:
+                # Even represents a file
+                if digit:
+                    files.append(Extent(current_id, pos, digit))
+                current_id += 1
+            pos += digit
+
+        self.size = pos
+        self.files = files
+        self.free = free
+
+    def _rebuild_free(self) -> None:
         """
-        checksum = 0
+        Sorts the file extents by position and recomputes the free spans as the gaps between them
+        """
+        self.files.sort(key=lambda extent: extent.start)
+
+        free = []
+        pos = 0
+        for extent in self.files:
+            if extent.start > pos:
+                free.append(Extent(EMPTY, pos, extent.start - pos))
+            pos = extent.end
+        if pos < self.size:
+            free.append(Extent(EMPTY, pos, self.size - pos))
+
+        self.free = free
+
+    @hot_path
+    def compact_disk(self) -> None:
+        """
+        Compacts the disk by moving blocks from the right to empty spaces on the left
+        Rather than moving one block at a time, moves the largest run that fits in both the
+        leftmost free span and what remains of the rightmost file
+        """
+        moved = []
+        files = self.files
+        right = len(files) - 1
+
+        for span in self.free:
+            gap_start = span.start
+            gap_size = span.length
+
+            # Only fill the gap from files that are to its right
+            while gap_size and right >= 0 and files[right].start > gap_start:
+                source = files[right]
+                run = min(gap_size, source.length)
+                moved.append(Extent(source.file_id, gap_start, run))
+
+                # Blocks are taken from the end of the file, so the start doesn't move
+                source.length -= run
+                self.stats["moves"] += 1
+                self.stats["blocks_moved"] += run
+                if self.trace is not None:
+                    self.trace.record(source.file_id, source.end, gap_start, run)
+                gap_start += run
+                gap_size -= run
+
+                if source.length == 0:
+                    right -= 1
+
+        self.files = files[: right + 1] + moved
+        self._rebuild_free()
+
+    @hot_path
+    def defrag_disk(self) -> None:
+        """
+        Compacts the disk without fragmenting files by moving each whole file, in descending
+        file ID order, into the leftmost free span that can hold it
 
-        for pos, block in enumerate(self.block_map):
+        Space freed by moving a file is never reused, as it is always to the right of every
+        file still waiting to be moved
+        """
+        free_spans = FreeSpanTree(self.free)
+        for source in sorted(
+            self.files, key=lambda extent: extent.file_id, reverse=True
+        ):
+            self.stats["span_lookups"] += 1
             try:
-                checksum += pos * int(block)
-            except ValueError:
+                index = free_spans.find_first(source.length, source.start)
+            except IndexError:
                 continue
+            dest = free_spans.allocate(index, source.length)
+            self.stats["span_allocations"] += 1
+            self.stats["moves"] += 1
+            self.stats["blocks_moved"] += source.length
+            if self.trace is not None:
+                self.trace.record(source.file_id, source.start, dest, source.length)
+            source.start = dest
 
-        return checksum
+        self._rebuild_free()
 
+    def to_block_map(self) -> array:
+        """
+        Expand the extents into the block map format used by HardDrive
+        """
+        block_map = array(BLOCK_TYPECODE, [EMPTY]) * self.size
+        for extent in self.files:
+            block_map[extent.start : extent.end] = (
+                array(BLOCK_TYPECODE, [extent.file_id]) * extent.length
+            )
+        return block_map
+
+    @property
+    def checksum(self) -> int:
+        """
+        Compute the checksum of the disk by summing the checksum of each file extent
+        """
+        return sum(extent.checksum for extent in self.files)
 
-if __name__ == "__main__":
-    # disk = "2333133121414131402"
 
-    with open("inputs/day09", "r") as fp:
-        disk = fp.readline().strip()
+def load_disk_map(path: str) -> str:
+    with open(path, "r") as fp:
+        return fp.readline().strip()
 
-    # Part 1
-    drive = HardDrive(disk)
+
+def part1_stats(path: str) -> tuple[int, OpStats]:
+    drive = HardDrive(load_disk_map(path))
     drive.compact_disk()
-    print("After compaction, disk checksum is", drive.checksum)
+    return drive.checksum, drive.stats
+
 
-    # Part 2
-    drive = HardDrive(disk)
+def part2_stats(path: str) -> tuple[int, OpStats]:
+    drive = HardDrive(load_disk_map(path))
     drive.defrag_disk_optimized(verbose=False)
-    print("After defragmentation, disk checksum is", drive.checksum)
+    return drive.checksum, drive.stats
+
+
+@cached_result
+def part1(path: str) -> int:
+    return part1_stats(path)[0]
+
+
+@cached_result
+def part2(path: str) -> int:
+    return part2_stats(path)[0]
+
+
+if __name__ == "__main__":
+    # disk = "2333133121414131402"
+    path = "inputs/day09"
+
+    print("After compaction, disk checksum is", part1(path))
+    print("After defragmentation, disk checksum is", part2(path))
@@ -1,54 +1,121 @@
-from utils import BoundedGrid, XYCoord
+from array import array
+from typing import Iterable
+
+from instrument import hot_path
+from packed_inputs import load_packed
+from result_cache import cached_result
+from utils import BoundedGrid, OpStats, XYCoord
 
 
 class TopoMap(BoundedGrid):
     def __init__(self, path: str):
         grid = []
 
-        with open(path, "r") as fp:
-            for line in fp.readlines():
-                grid.append(list(int(char) for char in list(line.strip())))
+        packed = load_packed(path)
+        if packed is not None:
+            width = packed["width"][0]
+            elevations = packed["elevations"]
+            for start in range(0, len(elevations), width):
+                grid.append(elevations[start : start + width].tolist())
+        else:
+            with open(path, "r") as fp:
+                for line in fp.readlines():
+                    grid.append(list(int(char) for char in list(line.strip())))
 
         max_x = len(grid[0]) - 1
         max_y = len(grid) - 1
         super().__init__(max_x, max_y)
 
         self.grid = grid
+        self.width = max_x + 1
+        self.stats = OpStats()
+        self._build_graph()
 
-    def find_trailheads(self) -> list[XYCoord]:
+    def _build_graph(self) -> None:
         """
-        Searches the topo map for the positions of all the trailheads
+        Builds the graph of valid steps between cells, i.e. steps that increase elevation by 1
+        Cells are indexed by their flat position y * width + x and the graph is stored in
+        compressed sparse row form: the neighbors of cell i are indices[indptr[i] : indptr[i + 1]]
+
+        Each direction is checked for every cell at once by comparing the elevations against
+        a copy shifted by one row or column
         """
-        trailheads = []
+        width = self.width
+        elevations = array("b", (elev for row in self.grid for elev in row))
+        num_cells = len(elevations)
 
-        for y, row in enumerate(self.grid):
-            for x, elev in enumerate(row):
-                if elev == 0:
-                    trailheads.append(XYCoord(x, y))
+        # For each direction, the cell offset and whether each cell has a valid step that way
+        steps = []
+        for offset, edge in ((-width, None), (width, None), (-1, 0), (1, width - 1)):
+            # Pair every cell with the cell offset from it, the pairing stops at the map edge
+            if offset > 0:
+                pairs = zip(range(num_cells), elevations, elevations[offset:])
+            else:
+                pairs = zip(range(-offset, num_cells), elevations[-offset:], elevations)
+            # Steps left or right can't wrap round from the edge column onto the next row
+            if edge is not None:
+                valid = {
+                    i
+                    for i, here, there in pairs
+                    if there == here + 1 and i % width != edge
+                }
+            else:
+                valid = {i for i, here, there in pairs if there == here + 1}
+            steps.append((offset, valid))
 
-        return trailheads
+        indptr = array("i", [0])
+        indices = array("i")
+        for cell in range(num_cells):
+            for offset, valid in steps:
+                if cell in valid:
+                    indices.append(cell + offset)
+            indptr.append(len(indices))
 
-    def valid_paths(self, pos: XYCoord) -> list[XYCoord]:
+        self.elevations = elevations
+        self.indptr = indptr
+        self.indices = indices
+        # Layered sweep results keyed on the target elevation, rebuilt whenever the map changes
+        self._tables: dict[int, tuple[list[int], list[int]]] = {}
+
+    def set_elevation(self, pos: XYCoord, elev: int) -> None:
         """
-        For the given position, return all adjacent positions that are an
-        increase of 1 in elevation
+        Edit the elevation of a single cell on the map
+        Rebuilds the step graph and discards any cached reachability tables
         """
-        paths = []
+        if not self._within_bounds(pos):
+            raise ValueError(f"{pos} is outside the map")
+        if not 0 <= elev <= 9:
+            raise ValueError(f"Elevation must be between 0 and 9, got {elev}")
 
-        curr_elev = self.grid[pos.y][pos.x]
+        self.grid[pos.y][pos.x] = elev
+        self._build_graph()
 
-        changes = [XYCoord(0, -1), XYCoord(0, 1), XYCoord(-1, 0), XYCoord(1, 0)]
+    def _cell(self, pos: XYCoord) -> int:
+        return pos.y * self.width + pos.x
 
-        for change in changes:
-            new_pos = pos + change
-            if (
-                self._within_bounds(new_pos)
-                and self.grid[new_pos.y][new_pos.x] == curr_elev + 1
-            ):
-                paths.append(new_pos)
+    def _pos(self, cell: int) -> XYCoord:
+        return XYCoord(cell % self.width, cell // self.width)
 
-        return paths
+    def find_trailheads(self) -> list[XYCoord]:
+        """
+        Searches the topo map for the positions of all the trailheads
+        """
+        return [
+            self._pos(cell) for cell, elev in enumerate(self.elevations) if elev == 0
+        ]
 
+    def valid_paths(self, pos: XYCoord) -> list[XYCoord]:
+        """
+        For the given position, return all adjacent positions that are an
+        increase of 1 in elevation
+        """
+        cell = self._cell(pos)
+        return [
+            self._pos(neighbor)
+            for neighbor in self.indices[self.indptr[cell] : self.indptr[cell + 1]]
+        ]
+
+    @hot_path
     def compute_trailhead_score(self, trailhead: XYCoord) -> int:
         """
         The trailhead score is the number of peaks you can reach walking from this tailhead
@@ -57,47 +124,130 @@ class TopoMap(BoundedGrid):
 
         Uses an iterative depth-first search approach to walk to the paths to a peak
         """
+        indptr, indices, elevations = self.indptr, self.indices, self.elevations
         peaks = set()
         visited = set()
-        stack = [trailhead]
+        stack = [self._cell(trailhead)]
 
         while len(stack) > 0:
             curr = stack.pop()
+            self.stats["dfs_pops"] += 1
             if curr not in visited:
                 visited.add(curr)
-                if self.grid[curr.y][curr.x] == 9:
+                if elevations[curr] == 9:
                     peaks.add(curr)
                 else:
-                    stack.extend(self.valid_paths(curr))
+                    stack.extend(indices[indptr[curr] : indptr[curr + 1]])
 
         return len(peaks)
 
+    @hot_path
     def compute_trailhead_rating(self, trailhead: XYCoord) -> int:
         """
         The trailhead rating is the number of unique paths you can take following 0 to 9
 
         This is basically the same algorithm as the trailhead score, but we don't skip visited nodes
-        and accumulate reached peaks in a list rather than a set
+        and accumulate reached peaks in a count rather than a set
         """
-        peaks = list()
-        stack = [trailhead]
+        indptr, indices, elevations = self.indptr, self.indices, self.elevations
+        peaks = 0
+        stack = [self._cell(trailhead)]
 
         while len(stack) > 0:
             curr = stack.pop()
-            if self.grid[curr.y][curr.x] == 9:
-                peaks.append(curr)
+            self.stats["dfs_pops"] += 1
+            if elevations[curr] == 9:
+                peaks += 1
             else:
-                stack.extend(self.valid_paths(curr))
+                stack.extend(indices[indptr[curr] : indptr[curr + 1]])
 
-        return len(peaks)
+        return peaks
+
+    @hot_path
+    def _sweep_layers(self, target: int = 9) -> tuple[list[int], list[int]]:
+        """
+        Computes the rating and reachable peaks of every cell on the map in a single sweep
+        working down the elevation layers from the target (9 for peaks) to 0
+
+        - ratings[cell] is the number of distinct paths from the cell to any target cell
+        - peaks[cell] is a bitset with one bit set per target cell reachable from the cell
+
+        Both are the sum/union of the values of the neighbors one elevation higher, so each
+        cell only needs to be visited once
+        Results are cached per target elevation until the map is edited
+        """
+        if not 0 <= target <= 9:
+            raise ValueError(f"Target elevation must be between 0 and 9, got {target}")
+        if target in self._tables:
+            return self._tables[target]
+
+        indptr, indices, elevations = self.indptr, self.indices, self.elevations
+        num_cells = len(elevations)
+
+        layers: list[list[int]] = [[] for _ in range(10)]
+        for cell, elev in enumerate(elevations):
+            layers[elev].append(cell)
+
+        ratings = [0] * num_cells
+        peaks = [0] * num_cells
+        for bit, cell in enumerate(layers[target]):
+            ratings[cell] = 1
+            peaks[cell] = 1 << bit
+
+        for elev in range(target - 1, -1, -1):
+            self.stats["sweep_cells"] += len(layers[elev])
+            for cell in layers[elev]:
+                rating = 0
+                reach = 0
+                for neighbor in indices[indptr[cell] : indptr[cell + 1]]:
+                    rating += ratings[neighbor]
+                    reach |= peaks[neighbor]
+                ratings[cell] = rating
+                peaks[cell] = reach
+
+        self._tables[target] = ratings, peaks
+        return ratings, peaks
+
+    def trailhead_scores(self) -> dict[XYCoord, int]:
+        """
+        The score of every trailhead on the map, computed from a single layered sweep
+        """
+        _, peaks = self._sweep_layers()
+        return {th: peaks[self._cell(th)].bit_count() for th in self.find_trailheads()}
+
+    def trailhead_ratings(self) -> dict[XYCoord, int]:
+        """
+        The rating of every trailhead on the map, computed from a single layered sweep
+        """
+        ratings, _ = self._sweep_layers()
+        return {th: ratings[self._cell(th)] for th in self.find_trailheads()}
+
+    def reachable_count(self, sources: Iterable[XYCoord], target: int = 9) -> int:
+        """
+        The number of distinct cells at the target elevation that can be reached by walking
+        up from any of the source cells
+        After the first query for a target, only the sources need to be visited
+        """
+        _, peaks = self._sweep_layers(target)
+        reach = 0
+        for source in sources:
+            reach |= peaks[self._cell(source)]
+        return reach.bit_count()
+
+    def path_count(self, sources: Iterable[XYCoord], target: int = 9) -> int:
+        """
+        The total number of distinct paths from any of the source cells up to a cell at the
+        target elevation
+        After the first query for a target, only the sources need to be visited
+        """
+        ratings, _ = self._sweep_layers(target)
+        return sum(ratings[self._cell(source)] for source in sources)
 
     def part1(self):
         """
         Find all trailheads on the map and calculate the score for each, print the sum off all the scores
         """
-        total_score = sum(
-            self.compute_trailhead_score(th) for th in self.find_trailheads()
-        )
+        total_score = sum(self.trailhead_scores().values())
 
         print("The total score for this map:", total_score)
 
@@ -106,13 +256,39 @@ class TopoMap(BoundedGrid):
         Find all trailheads on the map and calculate the rating for each
         Print the sum of all the ratings
         """
-        total_rating = sum(
-            self.compute_trailhead_rating(th) for th in self.find_trailheads()
-        )
+        total_rating = sum(self.trailhead_ratings().values())
 
         print("The total score for this map:", total_rating)
 
 
+def pack_input(path: str) -> dict[str, array]:
+    """
+    The parsed map as arrays for packed_inputs
+    """
+    topo = TopoMap(path)
+    return {"width": array("i", [topo.width]), "elevations": topo.elevations}
+
+
+def part1_stats(path: str) -> tuple[int, OpStats]:
+    topo = TopoMap(path)
+    return sum(topo.trailhead_scores().values()), topo.stats
+
+
+def part2_stats(path: str) -> tuple[int, OpStats]:
+    topo = TopoMap(path)
+    return sum(topo.trailhead_ratings().values()), topo.stats
+
+
+@cached_result
+def part1(path: str) -> int:
+    return part1_stats(path)[0]
+
+
+@cached_result
+def part2(path: str) -> int:
+    return part2_stats(path)[0]
+
+
 if __name__ == "__main__":
     input_path = "inputs/day10"
 
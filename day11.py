@@ -1,43 +1,594 @@
-import math
+import sqlite3
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
 from functools import cache
+from operator import mul
+from typing import Generator, Iterable, Protocol
+
+from instrument import hot_path
+from result_cache import cached_result
+from utils import OpStats
 
 
 BLINKS = 75
 
+# Powers of ten for exact digit counting, POWERS_OF_TEN[i] == 10 ** i
+# Extended on demand when a larger stone is seen
+POWERS_OF_TEN = [10**i for i in range(20)]
 
-@cache
-def blink_stone(stone: int, iteration: int) -> int:
+
+@dataclass(frozen=True)
+class BlinkStats:
+    blink: int
+    distinct: int  # number of distinct stone values
+    total: int  # total number of stones
+
+
+def num_digits(stone: int) -> int:
     """
-    Recursive function that stops when iteration == BLINKS
+    The number of decimal digits in a positive integer
+    Uses integer comparisons against the powers of ten table, so is exact for any size of int
+    """
+    while stone >= POWERS_OF_TEN[-1]:
+        POWERS_OF_TEN.append(POWERS_OF_TEN[-1] * 10)
+    return bisect_right(POWERS_OF_TEN, stone)
+
 
-    At each call, updates the stone and then calls itself with the new value
+def blink_once(stone: int) -> tuple[int, ...]:
+    """
+    Apply a single blink to a stone, returning the stone(s) it becomes
     - stone == 0 -> 1
     - num_digits(stone) is event -> split digits in half, truncate leading 0
     - otherwise -> stone * 2024
     """
+    if stone == 0:
+        return (1,)
+
+    digits = num_digits(stone)
+    if digits % 2 == 0:
+        return divmod(stone, POWERS_OF_TEN[digits // 2])
+
+    return (stone * 2024,)
+
+
+@cache
+def blink_stone(stone: int, iteration: int) -> int:
+    """
+    Recursive function that stops when iteration == BLINKS
+
+    At each call, updates the stone and then calls itself with the new value(s)
+    """
     if iteration == BLINKS:
         return 1
 
-    if stone == 0:
-        return blink_stone(1, iteration + 1)
+    return sum(blink_stone(new_stone, iteration + 1) for new_stone in blink_once(stone))
 
-    # Order of magnitude will be one less than the number of digits
-    # such that (10 ** oom) has the same number of digits as the input number
-    num_digits = math.floor(math.log10(stone)) + 1
-    if num_digits % 2 == 0:
-        midpoint_magnitude = 10 ** (num_digits // 2)
-        a = stone // midpoint_magnitude
-        b = stone % midpoint_magnitude
-        return blink_stone(a, iteration + 1) + blink_stone(b, iteration + 1)
 
-    return blink_stone(stone * 2024, iteration + 1)
+@hot_path
+def blink_batch(counts: Counter[int], modulus: int | None = None) -> Counter[int]:
+    """
+    Apply a single blink to every distinct stone value at once
+    Takes and returns the number of stones with each value, so a large list of starting stones
+    only costs as much as its distinct values
+    If a modulus is given, the counts are reduced by it
+    """
+    new_counts: Counter[int] = Counter()
+    for stone, num in counts.items():
+        for new_stone in blink_once(stone):
+            new_counts[new_stone] += num
+    if modulus:
+        for stone, num in new_counts.items():
+            new_counts[stone] = num % modulus
+    return new_counts
 
 
-def main(stones: list[int]):
-    num_stones = 0
+def evolve(
+    stones: Iterable[int], blinks: int, modulus: int | None = None
+) -> Generator[tuple[Counter[int], BlinkStats]]:
+    """
+    Iteratively blink a collection of stones, yielding the count of each stone value and the
+    stats for the row after every blink
+    If a modulus is given, the counts (and so the totals) are reduced by it
+
+    The order of the stones doesn't affect how they change, so only the number of stones
+    with each value is tracked and memory is bounded by the number of distinct values
+    """
+    counts = Counter(stones)
+    for blink in range(1, blinks + 1):
+        counts = blink_batch(counts, modulus)
+        total = counts.total()
+        yield counts, BlinkStats(
+            blink, len(counts), total % modulus if modulus else total
+        )
+
+
+@hot_path
+def count_stones(
+    stones: Iterable[int], blinks: int, stats: OpStats | None = None
+) -> int:
+    """
+    The number of stones there will be after blinking the given number of times
+    If given stats, counts the blinks and the distinct stone values blinked
+    """
+    counts = Counter(stones)
+    for step_counts, _ in evolve(counts, blinks):
+        if stats is not None:
+            stats["blinks"] += 1
+            stats["values_blinked"] += len(counts)
+        counts = step_counts
+    return counts.total()
+
+
+class TransitionMatrix:
+    """
+    The stone rules as a sparse matrix over a closed set of stone values
+    Row i holds how many stones of each value a single stone of value i becomes after one blink
+    Stone values are relabelled to row indices, values[i] is the value for row i
+    """
+
+    def __init__(self, values: list[int], rows: list[dict[int, int]]):
+        self.values = values
+        self.index = {value: i for i, value in enumerate(values)}
+        self.rows = rows
+
+    @classmethod
+    def from_stones(cls, stones: Iterable[int]) -> "TransitionMatrix":
+        """
+        Discovers every value that can be reached by blinking the given stones and builds the
+        transition matrix over them
+        Starting from real puzzle inputs this closes after a few thousand values
+        """
+        values = list(dict.fromkeys(stones))
+        index = {value: i for i, value in enumerate(values)}
+        rows: list[dict[int, int]] = []
+
+        # values grows as new stones are discovered, so this is a breadth first search
+        for value in values:
+            row: dict[int, int] = defaultdict(int)
+            for new_stone in blink_once(value):
+                if new_stone not in index:
+                    index[new_stone] = len(values)
+                    values.append(new_stone)
+                row[index[new_stone]] += 1
+            rows.append(dict(row))
+
+        return cls(values, rows)
+
+    @hot_path
+    def count_sequence(
+        self, stones: Iterable[int], terms: int, modulus: int
+    ) -> list[int]:
+        """
+        The number of stones modulo modulus after 0, 1, ..., terms - 1 blinks
+
+        Rather than blinking the stones forward, tracks how many stones each value becomes
+        after n blinks, which for the next blink is the sum over the (at most two) values it
+        becomes after one. That's a single gather per value, and the total for the starting
+        stones is then a sum over just their values
+        """
+        # Every value becomes one or two values, pad to two with a value that's always 0
+        zero = len(self.values)
+        firsts, seconds = [], []
+        for row in self.rows:
+            targets = [j for j, times in row.items() for _ in range(times)] + [zero]
+            firsts.append(targets[0])
+            seconds.append(targets[1])
+        pairs = list(zip(firsts, seconds))
+
+        starts = Counter(self.index[stone] for stone in stones)
+        becomes = [1] * len(self.values) + [0]
+        sequence = []
+        for _ in range(terms):
+            sequence.append(
+                sum(becomes[i] * num for i, num in starts.items()) % modulus
+            )
+            becomes = [(becomes[a] + becomes[b]) % modulus for a, b in pairs]
+            becomes.append(0)
+        return sequence
+
+
+def berlekamp_massey(sequence: list[int], modulus: int) -> list[int]:
+    """
+    The shortest linear recurrence c satisfied by the sequence modulo a prime
+    sequence[n] == sum(c[i] * sequence[n - 1 - i] for i in range(len(c))) for n >= len(c)
+    A recurrence of length d is only certain to be found from at least 2 * d terms
+
+    >>> berlekamp_massey([1, 1, 2, 3, 5, 8, 13, 21], 101)
+    [1, 1]
+    """
+    current: list[int] = []
+    last: list[int] = []
+    last_fail = 0
+    last_delta = 0
+    for n, value in enumerate(sequence):
+        predicted = sum(map(mul, current, reversed(sequence[n - len(current) : n])))
+        delta = (predicted - value) % modulus
+        if delta == 0:
+            continue
+
+        if not current:
+            current = [0] * (n + 1)
+            last_fail, last_delta = n, delta
+            continue
+
+        scale = delta * pow(last_delta, -1, modulus) % modulus
+        fixed = (
+            [0] * (n - last_fail - 1) + [scale] + [-c * scale % modulus for c in last]
+        )
+        fixed += [0] * (len(current) - len(fixed))
+        for i, c in enumerate(current):
+            fixed[i] = (fixed[i] + c) % modulus
+
+        if n - last_fail + len(last) >= len(current):
+            last, last_fail, last_delta = current, n, delta
+        current = fixed
+
+    return current
+
+
+def _poly_mul(left: list[int], right: list[int], modulus: int) -> list[int]:
+    """
+    Multiply two polynomials with coefficients modulo modulus, lowest degree first
+    Packs each polynomial into one big int with a coefficient per fixed width slot, wide enough
+    that the slots of the product can't overflow into each other, so the whole product is a
+    single int multiplication
+    """
+    if not left or not right:
+        return []
+    slot_bits = 2 * modulus.bit_length() + min(len(left), len(right)).bit_length()
+    slot = (slot_bits + 7) // 8
+
+    def pack(poly: list[int]) -> int:
+        return int.from_bytes(
+            b"".join(c.to_bytes(slot, "little") for c in poly), "little"
+        )
+
+    length = len(left) + len(right) - 1
+    data = (pack(left) * pack(right)).to_bytes(length * slot, "little")
+    return [
+        int.from_bytes(data[i : i + slot], "little") % modulus
+        for i in range(0, len(data), slot)
+    ]
+
+
+def _poly_inverse(poly: list[int], length: int, modulus: int) -> list[int]:
+    """
+    The inverse of a polynomial with constant term 1, modulo x ** length
+    By Newton's iteration, doubling the number of correct terms each round
+    """
+    inverse = [1]
+    correct = 1
+    while correct < length:
+        correct *= 2
+        product = _poly_mul(poly[:correct], inverse, modulus)[:correct]
+        step = [-c % modulus for c in product]
+        step[0] = (step[0] + 2) % modulus
+        inverse = _poly_mul(inverse, step, modulus)[:correct]
+    return inverse[:length]
+
+
+def recurrence_term(
+    recurrence: list[int], initial: list[int], n: int, modulus: int
+) -> int:
+    """
+    Term n of the sequence modulo a prime, given the recurrence from berlekamp_massey and its
+    first len(recurrence) terms
+
+    Term n is sum(r[i] * initial[i]), with r the coefficients of x ** n modulo the characteristic
+    polynomial x ** d - c[0] * x ** (d - 1) - ... - c[d - 1]
+    x ** n is found by repeated squaring, each square reduced by multiplying with a precomputed
+    inverse of the reversed characteristic polynomial, so it takes O(log n) polynomial products
+
+    >>> recurrence_term([1, 1], [0, 1], 90, 101) == 2880067194370816120 % 101
+    True
+    """
+    degree = len(recurrence)
+    if degree == 0:
+        return 0
+
+    # Lowest degree first, so the characteristic polynomial is this reversed
+    reversed_char = [1] + [-c % modulus for c in recurrence]
+    char = reversed_char[::-1]
+    inverse = _poly_inverse(reversed_char, degree - 1, modulus)
+
+    def reduce(poly: list[int]) -> list[int]:
+        # Split poly = quotient * char + remainder, finding the quotient from the top terms
+        poly = poly + [0] * (2 * degree - 1 - len(poly))
+        quotient = _poly_mul(poly[::-1][: degree - 1], inverse, modulus)[: degree - 1][
+            ::-1
+        ]
+        product = _poly_mul(quotient, char, modulus)
+        return [
+            (c - (product[i] if i < len(product) else 0)) % modulus
+            for i, c in enumerate(poly[:degree])
+        ]
+
+    power = [1] + [0] * (degree - 1)
+    for bit in bin(n)[2:]:
+        power = reduce(_poly_mul(power, power, modulus))
+        if bit == "1":
+            # Multiply by x, replacing the x ** degree term using the recurrence
+            top = power[-1]
+            power = [0] + power[:-1]
+            for i, c in enumerate(recurrence):
+                power[degree - 1 - i] = (power[degree - 1 - i] + top * c) % modulus
+
+    return sum(map(mul, power, initial)) % modulus
 
-    for stone in stones:
-        num_stones += blink_stone(stone, 0)
+
+# Miller-Rabin witnesses that between them catch every composite below 3.3 * 10 ** 24
+PRIME_WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+
+def is_prime(num: int) -> bool:
+    """
+    Whether num is prime, by Miller-Rabin with the fixed PRIME_WITNESSES
+    Exact below 3.3 * 10 ** 24, beyond that a composite passing every witness is vanishingly rare
+
+    >>> [num for num in range(20) if is_prime(num)]
+    [2, 3, 5, 7, 11, 13, 17, 19]
+    >>> is_prime(2**61 - 1), is_prime(2**61)
+    (True, False)
+    """
+    if num < 2:
+        return False
+    for witness in PRIME_WITNESSES:
+        if num % witness == 0:
+            return num == witness
+
+    odd, twos = num - 1, 0
+    while odd % 2 == 0:
+        odd //= 2
+        twos += 1
+    for witness in PRIME_WITNESSES:
+        x = pow(witness, odd, num)
+        if x in (1, num - 1):
+            continue
+        for _ in range(twos - 1):
+            x = x * x % num
+            if x == num - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def fast_forward(stones: Iterable[int], blinks: int, modulus: int | None = None) -> int:
+    """
+    The number of stones after blinking the given number of times, optionally modulo modulus
+
+    Without a modulus the count is exact, but grows exponentially with blinks, so is found by
+    count_stones
+    With a prime modulus, the count sequence satisfies a linear recurrence no longer than the
+    number of values in the closure of the stones, as the counts are a linear map applied
+    repeatedly to the starting stones. So after computing 2 * closure terms, the recurrence is
+    found by berlekamp_massey and any later term by recurrence_term, at a fixed cost however
+    many blinks there are
+    Berlekamp-Massey needs to divide, so any other modulus falls back to blinking the counts
+    forward modulo it, which takes time linear in blinks
+
+    >>> fast_forward([125, 17], 300, 10**9 + 7) == count_stones([125, 17], 300) % (10**9 + 7)
+    True
+    >>> [fast_forward([125, 17], 300, m) == count_stones([125, 17], 300) % m for m in (1000, 2**61)]
+    [True, True]
+    """
+    stones = list(stones)
+    if modulus is None:
+        return count_stones(stones, blinks)
+    if modulus < 1:
+        raise ValueError(f"Modulus must be a positive integer, got {modulus}")
+
+    matrix = TransitionMatrix.from_stones(stones)
+    terms = 2 * len(matrix.values)
+    if blinks < terms:
+        return matrix.count_sequence(stones, blinks + 1, modulus)[blinks]
+    if not is_prime(modulus):
+        total = 0
+        for _, blink_stats in evolve(stones, blinks, modulus):
+            total = blink_stats.total
+        return total
+
+    sequence = matrix.count_sequence(stones, terms, modulus)
+    recurrence = berlekamp_massey(sequence, modulus)
+    return recurrence_term(recurrence, sequence, blinks, modulus)
+
+
+@dataclass
+class MemoStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class MemoStore(Protocol):
+    """
+    A store of how many stones a stone becomes, keyed on (stone, remaining_blinks)
+    get returns None on a miss, puts may be held back until flush, and close flushes
+    """
+
+    stats: MemoStats
+
+    def get(self, key: tuple[int, int]) -> int | None: ...
+
+    def put(self, key: tuple[int, int], value: int) -> None: ...
+
+    def flush(self) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class SQLiteMemo:
+    """
+    An on-disk memo store, so results survive between runs
+    Writes are committed on flush or close
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        # Stones and counts can outgrow SQLite's 64 bit integers, so are stored as text
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS blinks ("
+            "stone TEXT NOT NULL, remaining INTEGER NOT NULL, count TEXT NOT NULL, "
+            "PRIMARY KEY (stone, remaining))"
+        )
+        self.stats = MemoStats()
+
+    def get(self, key: tuple[int, int]) -> int | None:
+        stone, remaining = key
+        row = self.conn.execute(
+            "SELECT count FROM blinks WHERE stone = ? AND remaining = ?",
+            (str(stone), remaining),
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return int(row[0])
+
+    def put(self, key: tuple[int, int], value: int) -> None:
+        stone, remaining = key
+        self.conn.execute(
+            "INSERT OR REPLACE INTO blinks VALUES (?, ?, ?)",
+            (str(stone), remaining, str(value)),
+        )
+
+    def flush(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+
+class LRUMemo:
+    """
+    An in-memory memo store holding at most maxsize results, evicting the least recently used
+    If given a backing store, misses fall through to it and every result is written through
+    so the backing store can warm future runs, flush and close pass through to it
+    """
+
+    def __init__(self, maxsize: int = 1_000_000, backing: MemoStore | None = None):
+        self.maxsize = maxsize
+        self.backing = backing
+        self.entries: OrderedDict[tuple[int, int], int] = OrderedDict()
+        self.stats = MemoStats()
+
+    def get(self, key: tuple[int, int]) -> int | None:
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+        self.stats.misses += 1
+        if self.backing is not None:
+            value = self.backing.get(key)
+            if value is not None:
+                self._insert(key, value)
+        return value
+
+    def put(self, key: tuple[int, int], value: int) -> None:
+        self._insert(key, value)
+        if self.backing is not None:
+            self.backing.put(key, value)
+
+    def flush(self) -> None:
+        if self.backing is not None:
+            self.backing.flush()
+
+    def close(self) -> None:
+        self.entries.clear()
+        if self.backing is not None:
+            self.backing.close()
+
+    def _insert(self, key: tuple[int, int], value: int) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.stats.evictions += 1
+
+
+def blink_stone_memo(stone: int, remaining: int, memo: MemoStore) -> int:
+    """
+    The number of stones a single stone becomes after the remaining number of blinks
+    Works like blink_stone, but results are kept in the given memo store
+    """
+    return count_stones_memo([stone], remaining, memo)
+
+
+@hot_path
+def count_stones_memo(stones: Iterable[int], blinks: int, memo: MemoStore) -> int:
+    """
+    The number of stones after blinking the given number of times, memoized in the given store
+
+    Works top down a level of remaining blinks at a time, looking each stone up in the store
+    and only blinking the misses into the next level, so a warm store cuts the walk short
+    Then fills in the misses bottom up, each stone's count is the sum of the counts one level
+    down of the stones it becomes, which are still held from the walk down. So an entry
+    evicted from a bounded store costs one sum rather than recomputing a whole subtree
+    The store is flushed once the counts are found, so a backing store keeps them
+    """
+    counts = Counter(stones)
+
+    # found[k] holds the counts of the stones reached after k blinks, misses[k] the stones
+    # among them the store had no count for
+    found: list[dict[int, int]] = []
+    misses: list[set[int]] = []
+    frontier = set(counts)
+    for remaining in range(blinks, 0, -1):
+        level = {}
+        for stone in frontier:
+            num = memo.get((stone, remaining))
+            if num is not None:
+                level[stone] = num
+        found.append(level)
+        misses.append(frontier.difference(level))
+        frontier = {
+            new_stone for stone in misses[-1] for new_stone in blink_once(stone)
+        }
+    found.append(dict.fromkeys(frontier, 1))
+
+    for depth in range(blinks - 1, -1, -1):
+        below = found[depth + 1]
+        level = found[depth]
+        for stone in misses[depth]:
+            num = sum(below[new_stone] for new_stone in blink_once(stone))
+            memo.put((stone, blinks - depth), num)
+            level[stone] = num
+
+    memo.flush()
+    return sum(num * found[0][stone] for stone, num in counts.items())
+
+
+def load_stones(path: str) -> list[int]:
+    with open(path, "r") as fp:
+        return [int(stone) for stone in fp.read().split()]
+
+
+def part1_stats(path: str) -> tuple[int, OpStats]:
+    stats = OpStats()
+    return count_stones(load_stones(path), 25, stats), stats
+
+
+def part2_stats(path: str) -> tuple[int, OpStats]:
+    stats = OpStats()
+    return count_stones(load_stones(path), BLINKS, stats), stats
+
+
+@cached_result
+def part1(path: str) -> int:
+    return part1_stats(path)[0]
+
+
+@cached_result
+def part2(path: str) -> int:
+    return part2_stats(path)[0]
+
+
+def main(stones: list[int]):
+    num_stones = count_stones(stones, BLINKS)
 
     print(num_stones)
 
@@ -0,0 +1,124 @@
+import atexit
+import json
+import os
+import time
+from collections import defaultdict
+from functools import wraps
+from typing import Callable, TypeVar
+
+# Set to the path to write timings to, e.g. AOC_PROFILE=profile.json
+# A path ending in .folded is written as collapsed stacks for flamegraph tools instead
+# {pid} in the path is replaced with the process ID, so separate processes don't overwrite each other
+PROFILE_ENV = "AOC_PROFILE"
+
+F = TypeVar("F", bound=Callable)
+
+
+class Profiler:
+    """
+    Aggregates timings of every call to a hot path function
+    Tracks the call stack so that time spent in nested hot paths can be separated out
+    into self time
+    """
+
+    def __init__(self):
+        self.durations: dict[str, list[int]] = defaultdict(list)
+        self.self_time: dict[str, int] = defaultdict(int)
+        self.stacks: dict[str, int] = defaultdict(int)
+        # Each frame is [name, time spent in child hot paths]
+        self._stack: list[list] = []
+
+    def enter(self, name: str) -> None:
+        self._stack.append([name, 0])
+
+    def exit(self, elapsed: int) -> None:
+        name, child_time = self._stack.pop()
+        own_time = elapsed - child_time
+
+        self.durations[name].append(elapsed)
+        self.self_time[name] += own_time
+        stack = ";".join(frame[0] for frame in self._stack)
+        self.stacks[f"{stack};{name}" if stack else name] += own_time
+
+        if self._stack:
+            self._stack[-1][1] += elapsed
+
+    def merge(self, other: "Profiler") -> None:
+        """
+        Add the timings of another profiler, e.g. one handed back from a worker process
+        """
+        for name, durations in other.durations.items():
+            self.durations[name].extend(durations)
+        for name, nanos in other.self_time.items():
+            self.self_time[name] += nanos
+        for stack, nanos in other.stacks.items():
+            self.stacks[stack] += nanos
+
+    def summary(self) -> dict[str, dict]:
+        """
+        Per function call counts, cumulative and self time and call time percentiles
+        All times are in seconds
+        """
+        summary = {}
+        for name, durations in self.durations.items():
+            ordered = sorted(durations)
+            summary[name] = {
+                "calls": len(ordered),
+                "cumulative": sum(ordered) / 1e9,
+                "self": self.self_time[name] / 1e9,
+                "p50": percentile(ordered, 50) / 1e9,
+                "p90": percentile(ordered, 90) / 1e9,
+                "p99": percentile(ordered, 99) / 1e9,
+            }
+        return summary
+
+    def dump(self, path: str) -> None:
+        """
+        Write the summary as JSON, or as collapsed stacks in microseconds if the path ends .folded
+        """
+        if path.endswith(".folded"):
+            with open(path, "w") as fp:
+                for stack, nanos in sorted(self.stacks.items()):
+                    fp.write(f"{stack} {nanos // 1000}\n")
+        else:
+            with open(path, "w") as fp:
+                json.dump(self.summary(), fp, indent=2)
+
+
+def percentile(ordered: list[int], pct: int) -> int:
+    """
+    Nearest rank percentile of an already sorted list
+    """
+    rank = max(0, -(-len(ordered) * pct // 100) - 1)
+    return ordered[rank]
+
+
+PROFILE_PATH = os.environ.get(PROFILE_ENV)
+PROFILER = Profiler() if PROFILE_PATH else None
+
+if PROFILER is not None:
+    atexit.register(
+        lambda: PROFILER.dump(PROFILE_PATH.replace("{pid}", str(os.getpid())))
+    )
+
+
+def hot_path(func: F) -> F:
+    """
+    Decorator marking a function as a hot path to be timed when profiling is enabled
+    When profiling is disabled, the function is returned untouched so there is no overhead
+    """
+    if PROFILER is None:
+        return func
+
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        PROFILER.enter(name)
+        start = time.perf_counter_ns()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            PROFILER.exit(time.perf_counter_ns() - start)
+
+    return wrapper  # type: ignore[return-value]
@@ -0,0 +1,168 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Callable
+
+# Frames kept per allocation, more attributes allocations to their callers at a higher cost
+TRACE_FRAMES = 1
+TOP_SITES = 10
+# How often to check for a new peak, and how far above the last snapshot it must be to take another
+SAMPLE_INTERVAL = 0.001
+SAMPLE_GROWTH = 1.1
+
+Solver = Callable[[str], int]
+
+
+def _site(stat: tracemalloc.StatisticDiff) -> dict:
+    frame = stat.traceback[0]
+    return {
+        "site": f"{frame.filename}:{frame.lineno}",
+        "bytes": stat.size_diff,
+        "count": stat.count_diff,
+    }
+
+
+def top_sites(
+    before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, top: int = TOP_SITES
+) -> dict[str, list[dict]]:
+    """
+    The lines that allocated the most memory between two snapshots, by bytes and by count
+    Only memory still allocated when the after snapshot was taken is counted
+    """
+    # Allocations made by the profiler itself would otherwise top the list
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ]
+    diff = after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "lineno"
+    )
+    return {
+        "by_bytes": [
+            _site(stat) for stat in sorted(diff, key=lambda s: -s.size_diff)[:top]
+        ],
+        "by_count": [
+            _site(stat) for stat in sorted(diff, key=lambda s: -s.count_diff)[:top]
+        ],
+    }
+
+
+class PeakSampler(threading.Thread):
+    """
+    Polls traced memory in the background, snapshotting each time it reaches a new high
+    so the memory held at the peak can be attributed to the lines that allocated it
+    Temporaries freed before the part returns never show up in a snapshot taken at its end
+    """
+
+    def __init__(
+        self, interval: float = SAMPLE_INTERVAL, growth: float = SAMPLE_GROWTH
+    ):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.growth = growth
+        self.snapshot: tracemalloc.Snapshot | None = None
+        self._sampled = 0
+        self._stop = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop.wait(self.interval):
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self._sampled * self.growth:
+                self.snapshot = tracemalloc.take_snapshot()
+                self._sampled = current
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.join()
+
+
+def profile_part(func: Solver, path: str, top: int = TOP_SITES) -> tuple[int, dict]:
+    """
+    Run a solver part with allocations traced, returning its answer and a report of
+    - peak: the most memory traced while it ran, above what was allocated beforehand
+      including the sampler's own snapshots, a few KiB for small inputs
+    - at_peak: the top sites holding memory at the highest sampled point
+    - retained: the top sites still holding memory once it returned
+    Allocations in worker processes the part starts are not traced
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(TRACE_FRAMES)
+    try:
+        # Start sampling first, so the thread's own allocations are part of the baseline
+        sampler = PeakSampler()
+        sampler.start()
+        try:
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            baseline, _ = tracemalloc.get_traced_memory()
+            answer = func(path)
+        finally:
+            sampler.stop()
+
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    report = {
+        "peak": peak - baseline,
+        "at_peak": top_sites(before, sampler.snapshot or after, top),
+        "retained": top_sites(before, after, top),
+    }
+    return answer, report
+
+
+def profile_day(day: str, path: str, top: int = TOP_SITES) -> dict:
+    """
+    Allocation reports for both parts of a day, keyed on part
+    """
+    module = importlib.import_module(day)
+    reports = {}
+    for part in ("part1", "part2"):
+        answer, report = profile_part(getattr(module, part), path, top)
+        reports[part] = {"answer": answer, **report}
+    return reports
+
+
+def print_report(name: str, report: dict) -> None:
+    print(f"{name}: answer {report['answer']}, peak {report['peak'] / 1024:.1f} KiB")
+    for site in report["at_peak"]["by_bytes"]:
+        print(
+            f"  {site['bytes'] / 1024:10.1f} KiB {site['count']:8} blocks  {site['site']}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Trace the memory allocated by each part of the given days"
+    )
+    parser.add_argument("days", nargs="+", help="Days to profile, e.g. day04")
+    parser.add_argument(
+        "--inputs", default="inputs", help="Directory holding the dayNN inputs"
+    )
+    parser.add_argument(
+        "--top", type=int, default=TOP_SITES, help="Allocation sites to report"
+    )
+    parser.add_argument("--json", help="Also write the reports to this path as JSON")
+    args = parser.parse_args(argv)
+
+    reports = {}
+    for day in args.days:
+        reports[day] = profile_day(day, os.path.join(args.inputs, day), args.top)
+        for part, report in reports[day].items():
+            print_report(f"{day}.{part}", report)
+
+    if args.json:
+        with open(args.json, "w") as fp:
+            json.dump(reports, fp, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
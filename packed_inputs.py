@@ -0,0 +1,111 @@
+import importlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+# A packed input sits next to the text input it was compiled from, e.g. inputs/day06.bin
+PACKED_SUFFIX = ".bin"
+MAGIC = b"AOCPACK1"
+
+# Size and modification time of the text input the packed file was compiled from
+HEADER = struct.Struct("<QQI")
+# Name length, typecode and number of items of each array
+ARRAY_HEADER = struct.Struct("<HcQ")
+ALIGNMENT = 8
+
+# Days whose modules provide pack_input, and so can be compiled
+PACKABLE_DAYS = ["day05", "day06", "day07", "day10"]
+
+
+def packed_path(path: str) -> str:
+    return path + PACKED_SUFFIX
+
+
+def _source_stamp(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _pad(offset: int) -> int:
+    return -offset % ALIGNMENT
+
+
+def write_packed(path: str, arrays: dict[str, array]) -> None:
+    """
+    Writes the parsed arrays for the text input at path to its packed file
+    Each array's data is aligned so it can be cast straight out of a memory map
+    """
+    size, mtime_ns = _source_stamp(path)
+    with open(packed_path(path), "wb") as fp:
+        fp.write(MAGIC)
+        fp.write(HEADER.pack(size, mtime_ns, len(arrays)))
+        for name, values in arrays.items():
+            encoded = name.encode()
+            fp.write(
+                ARRAY_HEADER.pack(len(encoded), values.typecode.encode(), len(values))
+            )
+            fp.write(encoded)
+            fp.write(b"\0" * _pad(fp.tell()))
+            fp.write(values.tobytes())
+
+
+def load_packed(path: str) -> dict[str, memoryview] | None:
+    """
+    Memory maps the packed form of the text input at path
+    Returns a memoryview of each array, or None if there is no packed file or the text input
+    has changed since it was compiled, in which case the text should be parsed instead
+    """
+    try:
+        with open(packed_path(path), "rb") as fp:
+            buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        # mmap raises a ValueError for an empty file
+        return None
+
+    view = memoryview(buffer)
+    if bytes(view[: len(MAGIC)]) != MAGIC:
+        return None
+
+    offset = len(MAGIC)
+    size, mtime_ns, num_arrays = HEADER.unpack_from(view, offset)
+    try:
+        if (size, mtime_ns) != _source_stamp(path):
+            return None
+    except FileNotFoundError:
+        return None
+    offset += HEADER.size
+
+    arrays = {}
+    for _ in range(num_arrays):
+        name_len, typecode, length = ARRAY_HEADER.unpack_from(view, offset)
+        offset += ARRAY_HEADER.size
+        name = bytes(view[offset : offset + name_len]).decode()
+        offset += name_len
+        offset += _pad(offset)
+
+        typecode = typecode.decode()
+        nbytes = length * array(typecode).itemsize
+        arrays[name] = view[offset : offset + nbytes].cast(typecode)
+        offset += nbytes
+
+    return arrays
+
+
+def compile_input(day: str, path: str) -> None:
+    """
+    Parse a day's text input and write its packed form alongside it
+    """
+    module = importlib.import_module(day)
+    write_packed(path, module.pack_input(path))
+
+
+if __name__ == "__main__":
+    # Usage: python packed_inputs.py [dayNN ...]
+    # Compiles inputs/dayNN for each given day, or every packable day if none are given
+    days = sys.argv[1:] or PACKABLE_DAYS
+    for day in days:
+        input_path = f"inputs/{day}"
+        compile_input(day, input_path)
+        print("Compiled", input_path, "to", packed_path(input_path))
@@ -0,0 +1,161 @@
+import ast
+import hashlib
+import json
+import os
+import sys
+from functools import cache, wraps
+from pathlib import Path
+from typing import Callable
+
+# Set to a directory to cache solver answers in, e.g. AOC_CACHE=.aoc_cache
+# Caching is disabled when unset
+CACHE_ENV = "AOC_CACHE"
+# The most the cache directory may hold in bytes, the least recently used answers are evicted
+CACHE_MAX_BYTES_ENV = "AOC_CACHE_MAX_BYTES"
+DEFAULT_MAX_BYTES = 1_000_000
+
+# Modules in this directory are the repo's own code, the rest are the standard library
+REPO_DIR = Path(__file__).parent
+
+Solver = Callable[[str], int]
+
+
+def file_digest(path: str | Path) -> str:
+    """
+    The SHA-256 of a file's contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def local_imports(source: Path) -> set[Path]:
+    """
+    The sources of the repo's own modules imported anywhere in a source file, including
+    imports made lazily inside functions
+    """
+    names = set()
+    for node in ast.walk(ast.parse(source.read_bytes())):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+
+    candidates = (REPO_DIR / f"{name.split('.')[0]}.py" for name in names)
+    return {path for path in candidates if path.exists()}
+
+
+@cache
+def code_version(module: str) -> str:
+    """
+    Hash of the source of a module and every module of the repo's it depends on, directly or
+    through other modules, so a change to any code that can affect an answer invalidates it
+    Found from the source rather than sys.modules, so it doesn't depend on what else happens
+    to have been imported
+    """
+    sources = {Path(sys.modules[module].__file__).resolve()}
+    pending = list(sources)
+    while pending:
+        for dependency in local_imports(pending.pop()):
+            dependency = dependency.resolve()
+            if dependency not in sources:
+                sources.add(dependency)
+                pending.append(dependency)
+
+    digest = hashlib.sha256()
+    for source in sorted(sources):
+        digest.update(source.name.encode())
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Stores solver answers on disk, content addressed by
+    (module, part, hash of the input, hash of the code)
+    Each answer is a small JSON file, the directory is kept under max_bytes by evicting
+    the least recently used answers
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def key(self, module: str, part: str, input_path: str) -> str:
+        parts = [module, part, file_digest(input_path), code_version(module)]
+        return hashlib.sha256(":".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> int | None:
+        entry = self.directory / f"{key}.json"
+        try:
+            with open(entry, "r") as fp:
+                answer = json.load(fp)["answer"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+        # Bump the modification time, which is used as the last access time for eviction
+        entry.touch()
+        return answer
+
+    def put(self, key: str, module: str, part: str, answer: int) -> None:
+        entry = self.directory / f"{key}.json"
+        # Write then rename, so a concurrent reader never sees a partial entry
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as fp:
+            json.dump({"module": module, "part": part, "answer": answer}, fp)
+        tmp.replace(entry)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used answers until the cache is within max_bytes
+        """
+        entries = []
+        for entry in self.directory.glob("*.json"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+
+CACHE_DIR = os.environ.get(CACHE_ENV)
+CACHE = (
+    ResultCache(CACHE_DIR, int(os.environ.get(CACHE_MAX_BYTES_ENV, DEFAULT_MAX_BYTES)))
+    if CACHE_DIR
+    else None
+)
+
+
+def cached_result(func: Solver) -> Solver:
+    """
+    Decorator for a solver taking the path to its input and returning the answer
+    When caching is enabled, the answer is looked up before running the solver at all
+    When caching is disabled, the function is returned untouched
+    """
+    if CACHE is None:
+        return func
+
+    module = func.__module__
+    part = func.__qualname__
+
+    @wraps(func)
+    def wrapper(path: str) -> int:
+        key = CACHE.key(module, part, path)
+        answer = CACHE.get(key)
+        if answer is None:
+            answer = func(path)
+            CACHE.put(key, module, part, answer)
+        return answer
+
+    return wrapper
@@ -0,0 +1,185 @@
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DAYS = [f"day{day:02}" for day in range(1, 12)]
+# The slowest days, started first so they aren't left running on their own at the end
+LONGEST_FIRST = ["day06", "day07", "day11"]
+
+
+def schedule(days: list[str]) -> list[str]:
+    """
+    Order days so that the longest running are submitted first
+    """
+    longest = [day for day in LONGEST_FIRST if day in days]
+    return longest + sorted(day for day in days if day not in LONGEST_FIRST)
+
+
+def run_day(
+    day: str, input_path: str, memprofile: bool = False, stats: bool = False
+) -> dict:
+    """
+    Import a day module and run both of its parts, timing each step
+    With memprofile, each part's allocations are traced and reported under part_memory,
+    which also slows the part down
+    With stats, each part's operation counts are reported under part_stats, which means
+    running the part rather than taking its answer from the cache
+    With profiling on, the day's hot path timings are handed back under profile
+    Runs inside a worker process, so the module is only imported where it's used, along with
+    the shared modules it needs the first time a worker imports one of them
+    """
+    start = time.perf_counter()
+    module = importlib.import_module(day)
+    import_time = time.perf_counter() - start
+
+    result = {"day": day, "import": import_time}
+    for part in ("part1", "part2"):
+        solver = getattr(module, f"{part}_stats" if stats else part)
+        start = time.perf_counter()
+        if memprofile:
+            from memprofile import profile_part
+
+            output, result[f"{part}_memory"] = profile_part(solver, input_path)
+        else:
+            output = solver(input_path)
+        result[f"{part}_time"] = time.perf_counter() - start
+
+        if stats:
+            result[part], part_stats = output
+            result[f"{part}_stats"] = dict(part_stats)
+        else:
+            result[part] = output
+
+    # Workers exit without running atexit handlers, and several at once would write over each
+    # other's profiles, so hand back this day's timings for run_all to merge and start afresh
+    instrument = sys.modules.get("instrument")
+    if instrument is not None and instrument.PROFILER is not None:
+        result["profile"] = instrument.PROFILER
+        instrument.PROFILER = instrument.Profiler()
+
+    return result
+
+
+def run_all(
+    days: list[str],
+    inputs: str,
+    jobs: int | None,
+    memprofile: bool = False,
+    stats: bool = False,
+) -> list[dict]:
+    """
+    Run every given day concurrently in a process pool
+    Returns the result of each day, in the order they finished
+    If profiling, the days' hot path timings are merged and written to the profile path
+    """
+    results = []
+    profiles = []
+    # Spawned workers start clean, so they only import the day modules they run and pick up
+    # the profiling and caching settings from the environment
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as executor:
+        futures = {
+            executor.submit(
+                run_day, day, os.path.join(inputs, day), memprofile, stats
+            ): day
+            for day in schedule(days)
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as exc:
+                result = {"day": futures[future], "error": repr(exc)}
+            if "profile" in result:
+                profiles.append(result.pop("profile"))
+            results.append(result)
+
+            if "error" in result:
+                print(f"{result['day']}: failed with {result['error']}")
+            else:
+                print(
+                    f"{result['day']}: part1 = {result['part1']} ({result['part1_time']:.3f}s), "
+                    f"part2 = {result['part2']} ({result['part2_time']:.3f}s), "
+                    f"import {result['import'] * 1000:.1f}ms"
+                )
+                if memprofile:
+                    print(
+                        f"{result['day']}: peak part1 {result['part1_memory']['peak'] / 1024:.1f} "
+                        f"KiB, part2 {result['part2_memory']['peak'] / 1024:.1f} KiB"
+                    )
+
+    if profiles:
+        import instrument
+
+        # If profiling was on when this process started, its own profiler writes the file
+        # when it exits, so merge into that one to write the same
+        merged = instrument.PROFILER or instrument.Profiler()
+        for profile in profiles:
+            merged.merge(profile)
+        path = os.environ[instrument.PROFILE_ENV]
+        merged.dump(path.replace("{pid}", str(os.getpid())))
+
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    # Imported here rather than at the top, as spawned workers import this module and would
+    # otherwise load them before run_day times a day's imports
+    from instrument import PROFILE_ENV
+    from result_cache import CACHE_ENV
+
+    parser = argparse.ArgumentParser(
+        description="Run every day's solutions concurrently"
+    )
+    parser.add_argument(
+        "days", nargs="*", default=DAYS, help="Days to run, defaults to all"
+    )
+    parser.add_argument(
+        "--inputs", default="inputs", help="Directory holding the dayNN inputs"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count(), help="Number of worker processes"
+    )
+    parser.add_argument(
+        "--profile", help=f"Time hot paths, writing to this path ({PROFILE_ENV})"
+    )
+    parser.add_argument(
+        "--cache", help=f"Cache answers in this directory ({CACHE_ENV})"
+    )
+    parser.add_argument(
+        "--memprofile",
+        action="store_true",
+        help="Trace each part's allocations, reported in the JSON results",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Count each part's operations, reported in the JSON results",
+    )
+    parser.add_argument("--json", help="Also write the results to this path as JSON")
+    args = parser.parse_args(argv)
+
+    # Workers read these when they import the day modules
+    if args.profile:
+        os.environ[PROFILE_ENV] = args.profile
+    if args.cache:
+        os.environ[CACHE_ENV] = args.cache
+
+    start = time.perf_counter()
+    results = run_all(args.days, args.inputs, args.jobs, args.memprofile, args.stats)
+    wall_time = time.perf_counter() - start
+
+    print(f"Ran {len(results)} days in {wall_time:.3f}s")
+    if args.json:
+        with open(args.json, "w") as fp:
+            json.dump({"wall_time": wall_time, "results": results}, fp, indent=2)
+
+    return 1 if any("error" in result for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,15 @@
+from collections import Counter
 from dataclasses import dataclass
 
 
+class OpStats(Counter):
+    """
+    Counts of the algorithmic operations a solver performed, keyed on operation name
+    e.g. stats["steps"] += 1
+    Each day's part1_stats and part2_stats return one alongside the answer
+    """
+
+
 @dataclass(frozen=True)
 class XYCoord:
     x: int